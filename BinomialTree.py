@@ -1,10 +1,59 @@
 #!/usr/bin/env python3
 import numpy as np
+from functools import lru_cache
+from BlackScholes import black_scholes
+from Instrumentation import Instrumented, stage
 
-class OptionPricer:
+CACHE_SIZE = 32  # Number of lattices kept by the LRU cache
+PARAMETERIZATIONS = ('crr', 'leisen-reimer')
+
+def _peizer_pratt(z, N):
+    """Peizer-Pratt (method 2) inversion of the normal distribution onto an N-step binomial probability."""
+    return 0.5 + np.copysign(0.5, z) * np.sqrt(1. - np.exp(-(z / (N + 1. / 3. + 0.1 / (N + 1.))) ** 2 * (N + 1. / 6.)))
+
+@lru_cache(maxsize = CACHE_SIZE)
+def _lattice(N, period, volatility, interest_rate, parameterization = 'crr', log_moneyness = 0.):
+    """
+    Build the spot-independent part of a binomial lattice.
+
+    Node j of layer n (j up moves) is S0 * u^j * d^(n - j) = S0 * g^n * s^(2j - n) with growth g = sqrt(u * d)
+    and stretch s = sqrt(u / d). The node table is s^k for k = N, N - 1, ..., -N; node prices are this table
+    scaled by the current stock price, so repricing as the spot moves reuses the cached entry. The CRR tree
+    has g = 1. The Leisen-Reimer tree is centred on the strike and depends on log(S0 / K) through d1 and d2.
+    The table is read-only.
+
+    Returns:
+    tuple: (u, d, a, p, f, g, node_table).
+    """
+    a = np.exp(interest_rate * (period / N))
+    f = np.exp(-interest_rate * (period / N))
+    if parameterization == 'crr':
+        u = np.exp(volatility * np.sqrt(period / N))
+        d = 1. / u
+        p = (a - d) / (u - d)
+    else:
+        d1 = (log_moneyness + (interest_rate + volatility ** 2 / 2.) * period) / (volatility * np.sqrt(period))
+        d2 = d1 - volatility * np.sqrt(period)
+        p = _peizer_pratt(d2, N)
+        u = a * _peizer_pratt(d1, N) / p
+        d = (a - p * u) / (1. - p)
+
+    node_table = np.exp(0.5 * np.log(u / d) * np.arange(N, -N - 1, -1))
+    node_table.setflags(write = False)
+    return u, d, a, p, f, np.sqrt(u * d), node_table
+
+def cache_info():
+    """Hit, miss and size statistics of the lattice cache."""
+    return _lattice.cache_info()
+
+def cache_clear():
+    """Empty the lattice cache and reset its statistics."""
+    _lattice.cache_clear()
+
+class OptionPricer(Instrumented):
     """Class to calculate option prices using a binomial tree approach."""
 
-    def __init__(self, curr_stock, strike, N, period, volatility, interest_rate):
+    def __init__(self, curr_stock, strike, N, period, volatility, interest_rate, parameterization = 'crr'):
         """
         Initialize the OptionPricer object with parameters.
 
@@ -15,63 +64,197 @@ class OptionPricer:
         period (float): Period to maturity.
         volatility (float): Volatility of the stock.
         interest_rate (float): Risk-free interest rate.
+        parameterization (str): Up/down moves and probability: 'crr' (Cox-Ross-Rubinstein) or 'leisen-reimer',
+                                whose error decays as 1/N^2 without odd/even oscillation (odd N only).
         """
 
+        if parameterization not in PARAMETERIZATIONS:
+            raise ValueError("Invalid parameterization")
+
+        if parameterization == 'leisen-reimer' and N % 2 == 0:
+            raise ValueError("The Leisen-Reimer tree requires an odd number of steps")
+
         self.N = N
         self.curr_stock = curr_stock
         self.strike = strike
-        self.u = np.exp(volatility * np.sqrt(period / N))
-        self.d = 1. / self.u
-        self.a = np.exp(interest_rate * (period / N))
-        self.p = (self.a - self.d) / (self.u - self.d)
-        self.f = np.exp(-interest_rate * (period / N))
-        self.stock_prices = [curr_stock * self.u ** (self.N - 2 * i) for i in range(self.N + 1)]
+        self.period = period
+        self.volatility = volatility
+        self.interest_rate = interest_rate
+        self.parameterization = parameterization
+        log_moneyness = float(np.log(curr_stock / strike)) if parameterization == 'leisen-reimer' else 0.
+        # The cache key is made of plain floats and ints, so NumPy scalars and 0-d arrays are accepted
+        self.u, self.d, self.a, self.p, self.f, self.growth, node_table = _lattice(
+            int(N), float(period), float(volatility), float(interest_rate), parameterization, log_moneyness)
+        # Node prices S0 * s^k for k = N, N - 1, ..., -N; layer n uses every other entry of [N - n, N + n],
+        # scaled by growth^n (see _lattice)
+        self.node_prices = curr_stock * node_table
+        self.stock_prices = self.growth ** N * self.node_prices[::2]
 
-    def calculate_option_price(self, option_type):
+    @stage
+    def calculate_option_price(self, option_type, smoothing = False, richardson = False):
         """
         Calculate the option price based on the specified option type.
 
         Parameters:
         option_type (str): Type of option ('EC', 'EP', 'AC', 'AP').
+        smoothing (bool): Broadie-Detemple smoothing: value the last step with the Black-Scholes formula
+                          instead of the payoff, which removes the odd/even oscillation of the CRR tree.
+        richardson (bool): Extrapolate from this tree and one with about N / 2 steps. The plain CRR error
+                           oscillates with N and does not extrapolate, so on the CRR tree this also turns
+                           smoothing on (the BBSR method) and assumes an error of order 1/N; the Leisen-Reimer
+                           error is assumed of order 1/N when early exercise can be optimal (American puts
+                           with r > 0, American calls with r < 0) and 1/N^2 otherwise.
 
         Returns:
         float: Option price.
         """
-        if option_type == 'EC':
-            return self._calculate_option_price(is_call = True, in_advance = False)
-        elif option_type == 'EP':
-            return self._calculate_option_price(is_call = False, in_advance = False)
-        elif option_type == 'AC':
-            return self._calculate_option_price(is_call = True, in_advance = True)
-        elif option_type == 'AP':
-            return self._calculate_option_price(is_call = False, in_advance = True)
-        else:
+        if option_type not in ('EC', 'EP', 'AC', 'AP'):
             raise ValueError("Invalid option type")
 
-    def _calculate_option_price(self, is_call, in_advance):
+        is_call = option_type.endswith('C')
+        in_advance = option_type.startswith('A')
+        smoothing = smoothing or (richardson and self.parameterization == 'crr')
+        price = self._calculate_option_price(is_call, in_advance, smoothing)
+
+        if richardson:
+            if self.N < 3:
+                raise ValueError("Richardson extrapolation requires at least 3 steps")
+            if self.parameterization == 'crr':
+                coarse_N, order = self.N // 2, 1
+            else:
+                # Early exercise reduces the Leisen-Reimer tree to monotone first-order convergence. Without
+                # dividends it is never optimal for calls unless r < 0 nor for puts unless r > 0, and the
+                # American price then equals the European one, which converges at second order
+                early_exercise = in_advance and (self.interest_rate < 0 if is_call else self.interest_rate > 0)
+                coarse_N, order = (self.N // 2) | 1, 1 if early_exercise else 2
+            coarse = OptionPricer(self.curr_stock, self.strike, coarse_N, self.period, self.volatility,
+                                  self.interest_rate, self.parameterization)
+            coarse._profile = self._profile
+            coarse_price = coarse._calculate_option_price(is_call, in_advance, smoothing)
+            weight, coarse_weight = float(self.N) ** order, float(coarse_N) ** order
+            price = (weight * price - coarse_weight * coarse_price) / (weight - coarse_weight)
+
+        return price
+
+    @stage
+    def _calculate_option_price(self, is_call, in_advance, smoothing = False):
         """
         Helper method to calculate option price.
 
         Parameters:
         is_call (bool): Whether it's a call option.
         in_advance (bool): Whether the option is exercised in advance.
+        smoothing (bool): Whether to value the last step with the Black-Scholes formula.
 
         Returns:
         float: Option price.
         """
-        options_prices = [max(price - self.strike, 0) if is_call else max(self.strike - price, 0) for price in self.stock_prices]
-
-        while len(options_prices) > 1:
-            for i in range(len(options_prices) - 1):
-                stock_price = self.curr_stock * self.u ** (len(options_prices) - 2 - 2 * i)
-                weighted_price = self.p * options_prices[i] + (1. - self.p) * options_prices[i + 1]
-                if in_advance:
-                    if is_call:
-                        options_prices[i] = max(self.f * weighted_price, stock_price - self.strike)
-                    else:
-                        options_prices[i] = max(self.f * weighted_price, self.strike - stock_price)
-                else:
-                    options_prices[i] = self.f * weighted_price
-            options_prices.pop()
-
-        return options_prices[0]
+        sign = 1. if is_call else -1.
+        if self.growth == 1.:
+            intrinsic = np.maximum(sign * (self.node_prices - self.strike), 0.)
+
+            def exercise(n):
+                return intrinsic[self.N - n : self.N + n + 1 : 2]
+        else:
+            def exercise(n):
+                layer_prices = self.growth ** n * self.node_prices[self.N - n : self.N + n + 1 : 2]
+                return np.maximum(sign * (layer_prices - self.strike), 0.)
+
+        # Backward induction on a single preallocated buffer; layer n occupies values[:n + 1]
+        start = self.N - 1 if smoothing else self.N
+        if smoothing:
+            layer_prices = self.growth ** start * self.node_prices[1 : 2 * self.N : 2]
+            values = black_scholes('EC' if is_call else 'EP', layer_prices, self.strike, self.period / self.N,
+                                   self.volatility, self.interest_rate)
+            if in_advance:
+                np.maximum(values, exercise(start), out = values)
+        else:
+            values = exercise(start).copy()
+
+        scratch = np.empty(max(start, 1))
+        up_weight = self.f * self.p
+        down_weight = self.f * (1. - self.p)
+
+        for n in range(start - 1, -1, -1):
+            layer = values[:n + 1]
+            np.multiply(values[1:n + 2], down_weight, out = scratch[:n + 1])
+            np.multiply(layer, up_weight, out = layer)
+            np.add(layer, scratch[:n + 1], out = layer)
+            if in_advance:
+                np.maximum(layer, exercise(n), out = layer)
+
+        return values[0]
+
+class BatchOptionPricer(Instrumented):
+    """Class to calculate prices of many contracts sharing one step count with a single binomial sweep."""
+
+    def __init__(self, curr_stock, strike, N, period, volatility, interest_rate):
+        """
+        Initialize the BatchOptionPricer object with arrays of contract parameters.
+
+        The contract parameters are broadcast against each other, so scalars may be mixed with arrays
+        (e.g. a strike curve for a single spot price).
+
+        Parameters:
+        curr_stock (array_like): Current stock prices.
+        strike (array_like): Strike prices.
+        N (int): Number of steps in the binomial tree, shared by all contracts.
+        period (array_like): Periods to maturity.
+        volatility (array_like): Volatilities of the stock.
+        interest_rate (array_like): Risk-free interest rates.
+        """
+
+        curr_stock, strike, period, volatility, interest_rate = (np.atleast_1d(x).astype(float) for x in
+            np.broadcast_arrays(curr_stock, strike, period, volatility, interest_rate))
+
+        self.N = N
+        self.curr_stock = curr_stock
+        self.strike = strike
+        self.u = np.exp(volatility * np.sqrt(period / N))
+        self.d = 1. / self.u
+        self.a = np.exp(interest_rate * (period / N))
+        self.p = (self.a - self.d) / (self.u - self.d)
+        self.f = np.exp(-interest_rate * (period / N))
+        # One row of node prices S0 * u^k, k = N, ..., -N, per contract (see OptionPricer)
+        self.node_prices = curr_stock[:, None] * np.exp(np.log(self.u)[:, None] * np.arange(self.N, -self.N - 1, -1))
+
+    @stage
+    def calculate_option_price(self, option_type):
+        """
+        Calculate the option prices for all contracts.
+
+        Parameters:
+        option_type (str or array_like of str): Type of option ('EC', 'EP', 'AC', 'AP'), either one for
+                                                all contracts or one per contract.
+
+        Returns:
+        np.ndarray: Option prices, one per contract.
+        """
+        option_type = np.broadcast_to(np.asarray(option_type, dtype = str), self.curr_stock.shape)
+        if not np.isin(option_type, ('EC', 'EP', 'AC', 'AP')).all():
+            raise ValueError("Invalid option type")
+
+        is_call = np.char.endswith(option_type, 'C')
+        in_advance = np.char.startswith(option_type, 'A')
+
+        intrinsic = np.maximum(np.where(is_call[:, None], self.node_prices - self.strike[:, None],
+                                        self.strike[:, None] - self.node_prices), 0.)
+
+        # Backward induction on a (contracts x nodes) buffer; layer n occupies values[:, :n + 1]
+        values = intrinsic[:, ::2].copy()
+        scratch = np.empty((len(values), self.N))
+        up_weight = (self.f * self.p)[:, None]
+        down_weight = (self.f * (1. - self.p))[:, None]
+        # European contracts never exercise early: mask their exercise values out of the projection
+        intrinsic[~in_advance] = -np.inf
+        american = in_advance.any()
+
+        for n in range(self.N - 1, -1, -1):
+            layer = values[:, :n + 1]
+            np.multiply(values[:, 1:n + 2], down_weight, out = scratch[:, :n + 1])
+            np.multiply(layer, up_weight, out = layer)
+            np.add(layer, scratch[:, :n + 1], out = layer)
+            if american:
+                np.maximum(layer, intrinsic[:, self.N - n : self.N + n + 1 : 2], out = layer)
+
+        return values[:, 0]
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 import numpy as np
+from Instrumentation import Instrumented, stage
 
-class AsianOptionPricer:
+AVERAGE_STEP = 0.1  # Spacing of the representative log-averages in units of the log-price step (Hull-White's h)
+
+class AsianOptionPricer(Instrumented):
     """Class to calculate Asian option prices using a binomial tree approach."""
 
     def __init__(self, current_stock, strike, N, period, volatility, interest_rate):
@@ -26,13 +29,22 @@ class AsianOptionPricer:
         self.p = (self.a - self.d) / (self.u - self.d)
         self.f = np.exp(-interest_rate * (period / N))
 
-    def calculate_asian_option_price(self, option_type, method):
+    @stage
+    def calculate_asian_option_price(self, option_type, method, engine = 'path', num_averages = None):
         """
         Calculate the Asian option price based on the specified option type and method.
 
         Parameters:
         option_type (str): Type of option ('EC', 'EP', 'AC', 'AP').
         method (str): Method for averaging ('arithmetic' or 'geometric').
+        engine (str): Tree representation ('path' enumerates all 2^N paths, 'representative' interpolates
+                      between representative averages per node at a cost of O(N^3) by default,
+                      'recombining' is exact for geometric averages with O(N^3) states per step).
+        num_averages (int): Number of representative averages per node for the 'representative' engine.
+                            None (recommended) spaces them AVERAGE_STEP * log(u) apart in log-average, so the
+                            count grows linearly with N. A fixed count is biased upwards, and the bias grows
+                            with N: interpolation errors add up over the steps while the grid spacing does not
+                            shrink. With 50 averages the error is about 4e-3 at N = 20 but above 0.1 at N = 100.
 
         Returns:
         float: Option price.
@@ -40,18 +52,27 @@ class AsianOptionPricer:
         if method not in ('arithmetic', 'geometric'):
             raise ValueError("Method must be 'arithmetic' or 'geometric'")
 
+        if engine not in ('path', 'representative', 'recombining'):
+            raise ValueError("Invalid engine")
+
+        if engine == 'recombining' and method != 'geometric':
+            raise ValueError("The recombining engine requires the geometric method")
+
+        if engine == 'representative' and num_averages is not None and num_averages < 2:
+            raise ValueError("num_averages must be at least 2")
+
         if option_type == 'EC':
-            return self._calculate_asian_option_price(is_call = True, in_advance = False, method = method)
+            return self._calculate_asian_option_price(is_call = True, in_advance = False, method = method, engine = engine, num_averages = num_averages)
         elif option_type == 'EP':
-            return self._calculate_asian_option_price(is_call = False, in_advance = False, method = method)
+            return self._calculate_asian_option_price(is_call = False, in_advance = False, method = method, engine = engine, num_averages = num_averages)
         elif option_type == 'AC':
-            return self._calculate_asian_option_price(is_call = True, in_advance = True, method = method)
+            return self._calculate_asian_option_price(is_call = True, in_advance = True, method = method, engine = engine, num_averages = num_averages)
         elif option_type == 'AP':
-            return self._calculate_asian_option_price(is_call = False, in_advance = True, method = method)
+            return self._calculate_asian_option_price(is_call = False, in_advance = True, method = method, engine = engine, num_averages = num_averages)
         else:
             raise ValueError("Invalid option type")
 
-    def _calculate_asian_option_price(self, is_call, in_advance, method):
+    def _calculate_asian_option_price(self, is_call, in_advance, method, engine = 'path', num_averages = None):
         """
         Helper method to calculate Asian option price.
 
@@ -59,16 +80,24 @@ class AsianOptionPricer:
         is_call (bool): Whether it's a call option.
         in_advance (bool): Whether the option is exercised in advance.
         method (str): Method for averaging ('arithmetic' or 'geometric').
+        engine (str): Tree representation ('path', 'representative' or 'recombining').
+        num_averages (int): Number of representative averages per node (None to size them by AVERAGE_STEP).
 
         Returns:
         float: Option price.
         """
+        if engine == 'representative':
+            return self._calculate_representative_option_price(is_call, in_advance, method, num_averages)
+        if engine == 'recombining':
+            return self._calculate_recombining_option_price(is_call, in_advance)
+
         stock_prices = self._initialize_stock_prices()
         ave_stock_prices = self._initialize_ave_stock_prices(stock_prices, method)
 
         option_price = self._calculate_option_prices(stock_prices, ave_stock_prices, is_call, in_advance)
         return option_price
 
+    @stage
     def _initialize_stock_prices(self):
         stock_prices = {1:{}}
 
@@ -86,6 +115,7 @@ class AsianOptionPricer:
 
         return stock_prices
 
+    @stage
     def _initialize_ave_stock_prices(self, stock_prices, method):
         ave_stock_prices = {}
 
@@ -101,6 +131,7 @@ class AsianOptionPricer:
 
         return ave_stock_prices
 
+    @stage
     def _calculate_option_prices(self, stock_prices, ave_stock_prices, is_call, in_advance):
 
         options_prices = {self.N: {}}
@@ -120,3 +151,154 @@ class AsianOptionPricer:
                     options_prices[i][path] = self.f * weighted_price
 
         return self.f * (self.p * options_prices[1]['u'] + (1. - self.p) * options_prices[1]['d'])
+
+    @stage
+    def _average_bounds(self, method):
+        """
+        Compute the logs of the smallest and largest running average reachable at every node.
+
+        At node (i, j), i.e. after i steps with j up moves, the largest average follows the path with
+        all up moves first and the smallest the path with all down moves first. Both are sums of u^s
+        over contiguous ranges of s and are read off a prefix sum over s = -N, ..., N.
+
+        Parameters:
+        method (str): Method for averaging ('arithmetic' or 'geometric').
+
+        Returns:
+        tuple: Lists of arrays (one per step i, indexed by j) with the lower and upper bounds of the
+               log of the average (arithmetic) or of the average log-price (geometric).
+        """
+        exponents = np.arange(-self.N, self.N + 1)
+        terms = self.u ** exponents if method == 'arithmetic' else exponents.astype(float)
+        prefix = np.concatenate(([0.], np.cumsum(terms)))
+
+        def range_sum(a, b):
+            # sum of terms for s in [a, b], zero when b < a
+            return prefix[b + self.N + 1] - prefix[a + self.N]
+
+        lower, upper = [], []
+        for i in range(self.N + 1):
+            j = np.arange(i + 1)
+            max_sum = range_sum(0, j) + range_sum(2 * j - i, j - 1)
+            min_sum = range_sum(j - i, 0) + range_sum(j - i + 1, 2 * j - i)
+            if method == 'arithmetic':
+                lower.append(np.log(self.curr_stock * min_sum / (i + 1)))
+                upper.append(np.log(self.curr_stock * max_sum / (i + 1)))
+            else:
+                lower.append(np.log(self.curr_stock) + np.log(self.u) * min_sum / (i + 1))
+                upper.append(np.log(self.curr_stock) + np.log(self.u) * max_sum / (i + 1))
+
+        return lower, upper
+
+    def _interpolate_values(self, values, lower, upper, averages):
+        """Linearly interpolate each node's option values on its grid of representative log-averages."""
+
+        M = values.shape[1]
+        width = upper - lower
+        position = np.divide((averages - lower[:, None]) * (M - 1), width[:, None],
+                             out = np.zeros_like(averages), where = width[:, None] > 0)
+        position = np.clip(position, 0, M - 1)
+        index = np.minimum(position.astype(int), M - 2)
+        weight = position - index
+
+        left = np.take_along_axis(values, index, axis = 1)
+        right = np.take_along_axis(values, index + 1, axis = 1)
+        return left + weight * (right - left)
+
+    @stage
+    def _calculate_representative_option_price(self, is_call, in_advance, method, num_averages):
+        """
+        Price the option on a Hull-White style tree of representative averages.
+
+        Every node (i, j) carries representative averages spaced evenly in log between the smallest and
+        largest average reachable at that node. The extreme averages spread like u^i, so a linear grid
+        would leave most points far from where the average goes; on the log grid the interpolation
+        error stays bounded as N grows. By default each step uses as many averages as needed to keep them
+        AVERAGE_STEP * log(u) apart at its widest node. Backward induction updates each representative
+        average with the child's stock price and interpolates the option value on the child's grid.
+
+        Parameters:
+        is_call (bool): Whether it's a call option.
+        in_advance (bool): Whether the option is exercised in advance.
+        method (str): Method for averaging ('arithmetic' or 'geometric').
+        num_averages (int): Number of representative averages per node (None to size them by AVERAGE_STEP;
+                            a fixed count is biased for large N).
+
+        Returns:
+        float: Option price.
+        """
+        lower, upper = self._average_bounds(method)
+        log_u = np.log(self.u)
+
+        def log_averages(i):
+            width = upper[i] - lower[i]
+            M = num_averages or max(int(np.ceil(width.max() / (AVERAGE_STEP * log_u))) + 1, 2)
+            return lower[i][:, None] + width[:, None] * np.linspace(0., 1., M)
+
+        def payoff(log_averages):
+            averages = np.exp(log_averages)
+            return np.maximum(averages - self.strike, 0) if is_call else np.maximum(self.strike - averages, 0)
+
+        values = payoff(log_averages(self.N))
+
+        for i in range(self.N - 1, -1, -1):
+            averages = log_averages(i)
+
+            # Log-prices of the up and down children of nodes j = 0, ..., i
+            exponents = 2 * np.arange(i + 1) - i
+            up_price = np.log(self.curr_stock) + log_u * (exponents + 1)
+            down_price = np.log(self.curr_stock) + log_u * (exponents - 1)
+            if method == 'arithmetic':
+                # log((i + 1) * A + S) - log(i + 2) with A = exp(averages), computed without overflow
+                up_averages = np.logaddexp(averages + np.log(i + 1), up_price[:, None]) - np.log(i + 2)
+                down_averages = np.logaddexp(averages + np.log(i + 1), down_price[:, None]) - np.log(i + 2)
+            else:
+                up_averages = (averages * (i + 1) + up_price[:, None]) / (i + 2)
+                down_averages = (averages * (i + 1) + down_price[:, None]) / (i + 2)
+            up_values = self._interpolate_values(values[1:], lower[i + 1][1:], upper[i + 1][1:], up_averages)
+            down_values = self._interpolate_values(values[:-1], lower[i + 1][:-1], upper[i + 1][:-1], down_averages)
+
+            values = self.f * (self.p * up_values + (1. - self.p) * down_values)
+            if in_advance and i > 0:
+                values = np.maximum(values, payoff(averages))
+
+        return values[0, 0]
+
+    @stage
+    def _calculate_recombining_option_price(self, is_call, in_advance):
+        """
+        Price a geometric Asian option exactly on a recombining tree.
+
+        The geometric average after i steps depends only on the number of up moves j and on the sum U
+        of the up-move counts over steps 1, ..., i, since the sum of log-prices is
+        (i + 1) * log(S0) + (2 * U - i * (i + 1) / 2) * log(u). An up move maps (j, U) to
+        (j + 1, U + j + 1) and a down move to (j, U + j). Step i is stored as an (i + 1, W) array
+        indexed by (j, e) with e = U - j * i + i * (i - 1) / 2 and W = i * (i - 1) / 2 + 1; in these
+        coordinates an up move keeps e and a down move shifts it by i, so each backward step is a pair
+        of shifted slices of the next layer.
+
+        Parameters:
+        is_call (bool): Whether it's a call option.
+        in_advance (bool): Whether the option is exercised in advance.
+
+        Returns:
+        float: Option price.
+        """
+        log_stock, log_u = np.log(self.curr_stock), np.log(self.u)
+
+        def payoff(i):
+            # log-average is linear in e and j, so the averages are an outer product of two 1-D factors
+            scale = 2 * log_u / (i + 1)
+            offset = log_stock + log_u * (-i * (i - 1) - i * (i + 1) / 2) / (i + 1)
+            averages = np.multiply.outer(np.exp(scale * i * np.arange(i + 1)), np.exp(offset + scale * np.arange(i * (i - 1) // 2 + 1)))
+            return np.maximum(averages - self.strike, 0, out = averages) if is_call else np.maximum(self.strike - averages, 0, out = averages)
+
+        # Unreachable (j, e) entries are padding: reachable states only ever read reachable children
+        values = payoff(self.N)
+        for i in range(self.N - 1, -1, -1):
+            width = i * (i - 1) // 2 + 1
+            values = self.f * (self.p * values[1:, :width] + (1. - self.p) * values[:-1, i : i + width])
+            if in_advance and i > 0:
+                np.maximum(values, payoff(i), out = values)
+
+        return values[0, 0]
@@ -1,5 +1,29 @@
+import math
 import numpy as np
-from scipy.stats import norm
+
+FAST_CDF_SIZE = 1000  # Inputs up to this size use math.erfc; larger arrays import scipy.special on first use
+
+_erfc = np.frompyfunc(math.erfc, 1, 1)
+
+def _norm_cdf(x):
+    """
+    Standard normal cumulative distribution function.
+
+    Scalars and small arrays are evaluated with math.erfc, so pricing a single contract never imports scipy
+    (which dominates the start-up time of a one-shot CLI call); large arrays use the vectorized scipy.special.ndtr.
+    """
+    x = np.asarray(x, dtype = float)
+    if x.ndim == 0:
+        return np.float64(0.5 * math.erfc(-float(x) / math.sqrt(2.)))
+    if x.size <= FAST_CDF_SIZE:
+        return 0.5 * _erfc(-x / math.sqrt(2.)).astype(float)
+
+    from scipy.special import ndtr
+    return ndtr(x)
+
+def _norm_pdf(x):
+    """Standard normal probability density function."""
+    return np.exp(-0.5 * np.square(x)) / math.sqrt(2. * math.pi)
 
 def black_scholes(option_type, current_stock, strike, period, volatility, interest_rate):
     """
@@ -29,8 +53,8 @@ def black_scholes(option_type, current_stock, strike, period, volatility, intere
     discount_factor = np.exp(-interest_rate * period)
 
     # Calculate call and put prices for European options
-    call_price = current_stock * norm.cdf(d1) - strike * discount_factor * norm.cdf(d2)
-    put_price = strike * discount_factor * norm.cdf(-d2) - current_stock * norm.cdf(-d1)
+    call_price = current_stock * _norm_cdf(d1) - strike * discount_factor * _norm_cdf(d2)
+    put_price = strike * discount_factor * _norm_cdf(-d2) - current_stock * _norm_cdf(-d1)
 
     # Return the appropriate option price based on the option type
     if option_type == 'EC':
@@ -53,6 +77,121 @@ def black_scholes(option_type, current_stock, strike, period, volatility, intere
             d1 = (np.log(F0 / strike + 1.e-20) + sigma ** 2 / 2. * period) / (sigma * np.sqrt(period))
             d2 = d1 - sigma * np.sqrt(period)
 
-            asian_price = np.exp(-interest_rate * period) * (F0 * norm.cdf(d1) - strike * norm.cdf(d2)) if option_type == 'AEC-A' else np.exp(-interest_rate * period) * (strike * norm.cdf(-d2) - F0 * norm.cdf(-d1))
+            asian_price = np.exp(-interest_rate * period) * (F0 * _norm_cdf(d1) - strike * _norm_cdf(d2)) if option_type == 'AEC-A' else np.exp(-interest_rate * period) * (strike * _norm_cdf(-d2) - F0 * _norm_cdf(-d1))
 
         return asian_price
+
+def _forward_parameters(option_type, current_stock, strike, period, volatility, interest_rate):
+    """
+    Map each contract to an equivalent Black-76 problem on its (average) forward.
+
+    Parameters:
+        option_type (np.ndarray): Option type codes, one per contract.
+        current_stock (np.ndarray): Current stock prices.
+        strike (np.ndarray): Strike prices.
+        period (np.ndarray): Times to maturity.
+        volatility (np.ndarray): Volatilities of the stock.
+        interest_rate (np.ndarray): Risk-free interest rates.
+
+    Returns:
+        tuple: Forward prices, effective volatilities and the log-moneyness offset added inside d1.
+    """
+    is_geometric = np.char.endswith(option_type, '-G')
+    is_arithmetic = np.char.endswith(option_type, '-A')
+
+    forward = current_stock * np.exp(interest_rate * period)
+    sigma = volatility.copy()
+
+    # Geometric average: lognormal with drift rho and volatility sigma / sqrt(3)
+    rho = (interest_rate - volatility ** 2 / 6.) / 2.
+    forward = np.where(is_geometric, current_stock * np.exp(rho * period), forward)
+    sigma = np.where(is_geometric, volatility * np.sqrt(1. / 3.), sigma)
+
+    # Arithmetic average: moment-matched lognormal
+    if is_arithmetic.any():
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            M1 = (np.exp(interest_rate * period) - 1.) / (interest_rate * period) * current_stock
+            M2 = 2. * np.exp((2 * interest_rate + volatility ** 2) * period) * current_stock ** 2 / ((interest_rate + volatility ** 2) * (2 * interest_rate + volatility ** 2) * period ** 2) \
+                + 2 * current_stock ** 2 / (interest_rate * period ** 2) * (1. / (2. * interest_rate + volatility ** 2) - np.exp(interest_rate * period) / (interest_rate + volatility ** 2))
+            forward = np.where(is_arithmetic, M1, forward)
+            sigma = np.where(is_arithmetic, np.sqrt(1. / period * np.log(M2 / M1 ** 2)), sigma)
+
+    offset = np.where(is_arithmetic, 1.e-20, 0.)
+    return forward, sigma, offset
+
+def _d1_d2(forward, strike, period, sigma, offset = 0.):
+    """Return the Black-76 d1 and d2 terms for a forward price."""
+
+    d1 = (np.log(forward / strike + offset) + sigma ** 2 / 2. * period) / (sigma * np.sqrt(period))
+    d2 = d1 - sigma * np.sqrt(period)
+    return d1, d2
+
+def black_scholes_batch(option_type, current_stock, strike, period, volatility, interest_rate):
+    """
+    Calculate Black-Scholes prices for a whole book of contracts in one broadcast evaluation.
+
+    All arguments are broadcast against each other, so a scalar may be mixed with arrays
+    (e.g. one strike for a ladder of spot prices).
+
+    Parameters:
+        option_type (array_like of str): Option type per contract, any of the codes accepted by black_scholes.
+        current_stock (array_like): Current stock prices.
+        strike (array_like): Strike prices.
+        period (array_like): Times to maturity of the options.
+        volatility (array_like): Volatilities of the stock.
+        interest_rate (array_like): Risk-free interest rates.
+
+    Returns:
+        np.ndarray: Option prices with the broadcast shape of the inputs.
+    """
+    option_type = np.asarray(option_type, dtype = str)
+    option_type, current_stock, strike, period, volatility, interest_rate = np.broadcast_arrays(
+        option_type, *(np.asarray(x, dtype = float) for x in (current_stock, strike, period, volatility, interest_rate)))
+
+    valid_option_types = ('EC', 'EP', 'AEC-A', 'AEP-A', 'AEC-G', 'AEP-G')
+    if not np.isin(option_type, valid_option_types).all():
+        raise ValueError("Invalid option type")
+
+    forward, sigma, offset = _forward_parameters(option_type, current_stock, strike, period, volatility, interest_rate)
+    d1, d2 = _d1_d2(forward, strike, period, sigma, offset)
+    discount_factor = np.exp(-interest_rate * period)
+
+    is_call = np.isin(option_type, ('EC', 'AEC-A', 'AEC-G'))
+    call_price = discount_factor * (forward * _norm_cdf(d1) - strike * _norm_cdf(d2))
+    put_price = discount_factor * (strike * _norm_cdf(-d2) - forward * _norm_cdf(-d1))
+    return np.where(is_call, call_price, put_price)
+
+def discrete_geometric_asian(option_type, current_stock, strike, period, volatility, interest_rate, N):
+    """
+    Calculate the price of a geometric average Asian option monitored at N + 1 equally spaced dates.
+
+    The average includes the current stock price and the prices after each of the N steps, as in the
+    binomial tree and Monte Carlo pricers. As N grows the price tends to black_scholes('AEC-G' / 'AEP-G').
+
+    Parameters:
+        option_type (str): Type of option ('AEC-G' for Asian call, 'AEP-G' for Asian put).
+        current_stock (float): Current stock price.
+        strike (float): Strike price.
+        period (float): Time to maturity of the option.
+        volatility (float): Volatility of the stock.
+        interest_rate (float): Risk-free interest rate.
+        N (int): Number of monitoring steps.
+
+    Returns:
+        float: Option price.
+    """
+    if option_type not in ('AEC-G', 'AEP-G'):
+        raise ValueError("Invalid option type")
+
+    # The log of the geometric average is normal with this mean and variance
+    mean = np.log(current_stock) + (interest_rate - volatility ** 2 / 2.) * period / 2.
+    variance = volatility ** 2 * period * (2 * N + 1) / (6. * (N + 1))
+
+    d1 = (mean - np.log(strike) + variance) / np.sqrt(variance)
+    d2 = d1 - np.sqrt(variance)
+    forward = np.exp(mean + variance / 2.)
+    discount_factor = np.exp(-interest_rate * period)
+
+    if option_type == 'AEC-G':
+        return discount_factor * (forward * _norm_cdf(d1) - strike * _norm_cdf(d2))
+    return discount_factor * (strike * _norm_cdf(-d2) - forward * _norm_cdf(-d1))
@@ -1,10 +1,200 @@
 #!/usr/bin/env python3
 import numpy as np
-import scipy.sparse as sp
-from scipy.sparse.linalg import spsolve
-import scipy.interpolate as spi
+from functools import lru_cache
+from Instrumentation import Instrumented, stage
 
-class OptionPricer:
+CACHE_SIZE = 32  # Number of discretizations kept by the LRU cache
+
+def _stock_grid(max_stock_price, num_stock_steps, grid_type, strike, grid_concentration):
+    """Stock prices of the grid rows: uniform, or sinh-stretched around the strike."""
+
+    if grid_type == 'uniform':
+        return np.linspace(0, max_stock_price, num_stock_steps + 1)
+
+    # S = K + alpha * sinh(xi) with xi uniform: the spacing is ~alpha * dxi near the strike
+    # and grows exponentially away from it, while the end points stay at 0 and max_stock_price
+    alpha = grid_concentration * strike
+    xi = np.linspace(np.arcsinh(-strike / alpha), np.arcsinh((max_stock_price - strike) / alpha), num_stock_steps + 1)
+    stock_values = strike + alpha * np.sinh(xi)
+    stock_values[[0, -1]] = 0., max_stock_price
+    return stock_values
+
+def _coefficients(stock_values, volatility, interest_rate, deltaT, PDE_method):
+    """Sub-diagonal, diagonal and super-diagonal coefficients of the interior grid rows."""
+
+    # Central differences on a possibly non-uniform grid with spacings h- = S_j - S_{j-1} and h+ = S_{j+1} - S_j;
+    # on a uniform grid S_j = j * h these reduce to the classical coefficients in j
+    stock = stock_values[1:-1]
+    h_minus = np.diff(stock_values)[:-1]
+    h_plus = np.diff(stock_values)[1:]
+    drift = interest_rate * stock * deltaT
+    diffusion_square = (volatility * stock)**2 * deltaT
+
+    a = (diffusion_square - drift * h_plus) / (h_minus * (h_minus + h_plus))
+    c = (diffusion_square + drift * h_minus) / (h_plus * (h_minus + h_plus))
+    b = - (diffusion_square - drift * (h_plus - h_minus)) / (h_minus * h_plus)
+    if PDE_method != 'explicit':
+        b -= interest_rate * deltaT
+    return a, b, c
+
+@lru_cache(maxsize = CACHE_SIZE)
+def _discretization(volatility, interest_rate, deltaT, max_stock_price, num_stock_steps, grid_type, strike,
+                    grid_concentration, PDE_method, rannacher_steps):
+    """
+    Build the stock grid, coefficients and factorized time-stepping operators of one PDE discretization.
+
+    Only structural inputs enter the key, so repeated solves (other option types, strikes on a uniform grid,
+    spot ladders) reuse the factorization and only redo the payoff and boundary work. The returned arrays are
+    shared between callers and are made read-only.
+
+    Returns:
+    tuple: (stock_values, a, b, c, theta, A, M, M_implicit); A and M_implicit are None for the explicit method.
+    """
+    # scipy.sparse is slow to import, so load it on the first discretization rather than with the module
+    import scipy.sparse as sp
+    from scipy.sparse.linalg import splu
+
+    stock_values = _stock_grid(max_stock_price, num_stock_steps, grid_type, strike, grid_concentration)
+    a, b, c = _coefficients(stock_values, volatility, interest_rate, deltaT, PDE_method)
+    for array in (stock_values, a, b, c):
+        array.setflags(write = False)
+
+    A = sp.diags([a[1:], b, c[:-1]], [-1, 0, 1],  format='csc')
+    I = sp.eye(num_stock_steps - 1, format='csc')
+    if PDE_method == 'explicit':
+        return stock_values, a, b, c, 0., None, (I + A) / (1 + interest_rate * deltaT), None
+
+    # Factor the tridiagonal system once; every time step is then an O(n) back-solve
+    theta = 0.5 if PDE_method == 'crank-nicolson' else 1.
+    M = splu(I - theta * A, permc_spec = 'NATURAL')
+    M_implicit = splu(I - A, permc_spec = 'NATURAL') if rannacher_steps else M
+    return stock_values, a, b, c, theta, A, M, M_implicit
+
+def cache_info():
+    """Hit, miss and size statistics of the discretization cache."""
+    return _discretization.cache_info()
+
+def cache_clear():
+    """Empty the discretization cache and reset its statistics."""
+    _discretization.cache_clear()
+
+def brennan_schwartz(lower, diag, upper, rhs, obstacle, is_call):
+    """
+    Solve the linear complementarity problem of a tridiagonal system with the Brennan-Schwartz algorithm.
+
+    The system is eliminated towards the continuation region and back-substituted from the exercise
+    region, taking the maximum with the obstacle at every node. This is exact when the exercise region
+    is a single interval at one end of the grid (low stock prices for puts, high for calls).
+
+    Parameters:
+    lower (np.ndarray): Sub-diagonal of the matrix (length n - 1).
+    diag (np.ndarray): Diagonal of the matrix (length n).
+    upper (np.ndarray): Super-diagonal of the matrix (length n - 1).
+    rhs (np.ndarray): Right-hand side.
+    obstacle (np.ndarray): Early exercise values.
+    is_call (bool): Whether the exercise region lies at the top of the grid.
+
+    Returns:
+    np.ndarray: Solution.
+    """
+    if is_call:
+        # Mirror the grid so the exercise region is at the bottom, as for a put
+        x = brennan_schwartz(upper[::-1], diag[::-1], lower[::-1], rhs[::-1], obstacle[::-1], False)
+        return x[::-1]
+
+    # Scalar recurrences: plain Python floats are much faster to index than NumPy arrays
+    lower, upper, obstacle = lower.tolist(), upper.tolist(), obstacle.tolist()
+    d, r = diag.tolist(), rhs.tolist()
+    n = len(d)
+
+    # Eliminate the super-diagonal from the bottom row upwards
+    for j in range(n - 2, -1, -1):
+        m = upper[j] / d[j + 1]
+        d[j] -= m * lower[j]
+        r[j] -= m * r[j + 1]
+
+    # Substitute from the bottom row, projecting onto the obstacle
+    x = [max(r[0] / d[0], obstacle[0])]
+    for j in range(1, n):
+        x.append(max((r[j] - lower[j - 1] * x[j - 1]) / d[j], obstacle[j]))
+    return np.array(x)
+
+def projected_sor(lower, diag, upper, rhs, obstacle, x, omega = 1.2, tol = 1e-10, max_iter = 10000):
+    """
+    Solve the linear complementarity problem of a tridiagonal system with projected SOR.
+
+    Even and odd nodes are updated alternately (red-black ordering), so each half sweep is one vectorized update.
+
+    Parameters:
+    lower (np.ndarray): Sub-diagonal of the matrix (length n - 1).
+    diag (np.ndarray): Diagonal of the matrix (length n).
+    upper (np.ndarray): Super-diagonal of the matrix (length n - 1).
+    rhs (np.ndarray): Right-hand side.
+    obstacle (np.ndarray): Early exercise values.
+    x (np.ndarray): Initial guess.
+    omega (float): Over-relaxation factor.
+    tol (float): Convergence tolerance on the largest update.
+    max_iter (int): Maximum number of sweeps.
+
+    Returns:
+    np.ndarray: Solution.
+    """
+    n = len(diag)
+    x = np.maximum(x, obstacle)
+    sub = np.concatenate(([0.], lower))
+    sup = np.concatenate((upper, [0.]))
+    padded = np.zeros(n + 2)
+
+    for _ in range(max_iter):
+        change = 0.
+        for start in (0, 1):
+            nodes = slice(start, n, 2)
+            padded[1:-1] = x
+            y = (rhs[nodes] - sub[nodes] * padded[start:n:2] - sup[nodes] * padded[start + 2:n + 2:2]) / diag[nodes]
+            update = np.maximum(x[nodes] + omega * (y - x[nodes]), obstacle[nodes])
+            change = max(change, np.max(np.abs(update - x[nodes])))
+            x[nodes] = update
+        if change < tol:
+            break
+    return x
+
+class PriceSurface:
+    """Solved finite difference grid, queryable for prices and Greeks at arbitrary stock prices."""
+
+    def __init__(self, stock_values, deltaT, grid):
+        """
+        Initialize the PriceSurface object with a solved grid.
+
+        Parameters:
+        stock_values (np.ndarray): Stock prices of the grid rows.
+        deltaT (float): Time step between grid columns.
+        grid (np.ndarray): Option values; column i is the value i time steps from now.
+        """
+
+        self.stock_values = stock_values
+        self.deltaT = deltaT
+        self.grid = grid
+        self._delta = np.gradient(grid[:, 0], stock_values)
+        self._gamma = np.gradient(self._delta, stock_values)
+        self._theta = (grid[:, 1] - grid[:, 0]) / deltaT
+
+    def price(self, stock):
+        """Option price at the given stock price(s)."""
+        return np.interp(stock, self.stock_values, self.grid[:, 0])
+
+    def delta(self, stock):
+        """Delta (first derivative in the stock price) at the given stock price(s)."""
+        return np.interp(stock, self.stock_values, self._delta)
+
+    def gamma(self, stock):
+        """Gamma (second derivative in the stock price) at the given stock price(s)."""
+        return np.interp(stock, self.stock_values, self._gamma)
+
+    def theta(self, stock):
+        """Theta (derivative in calendar time, per year) at the given stock price(s)."""
+        return np.interp(stock, self.stock_values, self._theta)
+
+class OptionPricer(Instrumented):
     """Class to calculate option prices using finite difference methods."""
 
     def __init__(self, current_stock, strike, num_steps, period, volatility, interest_rate):
@@ -29,7 +219,9 @@ class OptionPricer:
         self.interest_rate = interest_rate
         self.discount_factor = np.exp(- interest_rate * (period / num_steps))
 
-    def calculate_option_price(self, option_type, max_stock_price, num_stock_steps, PDE_method):
+    @stage
+    def calculate_option_price(self, option_type, max_stock_price, num_stock_steps, PDE_method, rannacher_steps = 0,
+                               american_method = 'projection', grid_type = 'uniform', grid_concentration = 0.1):
         """
         Calculate the option price using finite difference methods.
 
@@ -38,85 +230,156 @@ class OptionPricer:
                            'AC' for American call, 'AP' for American put).
         max_stock_price (float): Maximum stock price.
         num_stock_steps (int): Number of steps in the stock price grid.
-        PDE_method (str): Method for solving the partial differential equation ('implicit' or 'explicit').
+        PDE_method (str): Method for solving the partial differential equation ('implicit', 'explicit' or 'crank-nicolson').
+        rannacher_steps (int): Number of implicit steps taken from maturity before switching to Crank-Nicolson,
+                               to damp the oscillations caused by the payoff kink ('crank-nicolson' only).
+        american_method (str): Early exercise treatment for American options: 'projection' takes the maximum with
+                               the exercise value after each step, 'brennan-schwartz' and 'psor' solve the
+                               constrained implicit or Crank-Nicolson system exactly.
+        grid_type (str): Spacing of the stock price grid: 'uniform', or 'sinh' to concentrate the nodes around the strike.
+        grid_concentration (float): Width of the refined region of the 'sinh' grid as a fraction of the strike;
+                                    smaller values cluster the nodes more tightly.
 
         Returnum_stock_steps:
         float: Option price.
         """
 
+        return self.calculate_price_surface(option_type, max_stock_price, num_stock_steps, PDE_method,
+                                            rannacher_steps, american_method, grid_type,
+                                            grid_concentration).price(self.current_stock)
+
+    @stage
+    def calculate_price_surface(self, option_type, max_stock_price, num_stock_steps, PDE_method, rannacher_steps = 0,
+                                american_method = 'projection', grid_type = 'uniform', grid_concentration = 0.1):
+        """
+        Solve the PDE once and return the whole solution as a queryable surface.
+
+        A ladder of spot prices then costs one solve: the surface interpolates prices and Greeks at any stock
+        price on the grid. The parameters are those of calculate_option_price; the current stock price is not used.
+
+        Returns:
+        PriceSurface: Solved grid with vectorized price, delta, gamma and theta lookups.
+        """
+
         if option_type not in ('EC', 'EP', 'AC', 'AP'):
             raise ValueError("Invalid option type")
 
-        if PDE_method not in ('implicit', 'explicit'):
+        if PDE_method not in ('implicit', 'explicit', 'crank-nicolson'):
             raise ValueError("Invalid PDE method")
 
+        if rannacher_steps and PDE_method != 'crank-nicolson':
+            raise ValueError("Rannacher steps require the crank-nicolson method")
+
+        if american_method not in ('projection', 'brennan-schwartz', 'psor'):
+            raise ValueError("Invalid American method")
+
+        if american_method != 'projection' and PDE_method == 'explicit':
+            raise ValueError("The explicit method only supports the projection American method")
+
+        if grid_type not in ('uniform', 'sinh'):
+            raise ValueError("Invalid grid type")
+
+        if grid_concentration <= 0:
+            raise ValueError("Invalid grid concentration")
+
         self._set_grid(num_stock_steps)
-        self._set_terminal_condition(option_type, max_stock_price, num_stock_steps)
+        self._set_discretization(max_stock_price, num_stock_steps, PDE_method, rannacher_steps, grid_type,
+                                 grid_concentration)
+        self._set_terminal_condition(option_type)
         self._set_boundary_condition(option_type, max_stock_price)
-        self._set_coefficient(PDE_method)
-        self._set_matrix(PDE_method)
-        self._solve(option_type, PDE_method)
-        return self._interpolate(max_stock_price)
+        self._solve(option_type, PDE_method, rannacher_steps, american_method)
+        return PriceSurface(self.stock_values, self.deltaT, self.grid)
 
+    @stage
     def _set_grid(self, num_stock_steps):
         """Set up the grid for the finite difference method."""
 
         self.num_stock_steps = num_stock_steps
         self.grid = np.zeros(shape = (num_stock_steps + 1, self.num_steps + 1))
 
-    def _set_terminal_condition(self, option_type, max_stock_price, num_stock_steps):
-        """Set the terminal condition for the option."""
+    @stage
+    def _set_discretization(self, max_stock_price, num_stock_steps, PDE_method, rannacher_steps, grid_type,
+                            grid_concentration):
+        """Set the stock grid, coefficients and matrices, reusing a cached discretization when available."""
+
+        # The uniform grid does not depend on the strike, so leave it out of the cache key. The key is made of
+        # plain floats and ints, so NumPy scalars and 0-d arrays are accepted (and share entries with floats)
+        if grid_type == 'sinh':
+            strike, grid_concentration = float(self.strike), float(grid_concentration)
+        else:
+            strike = grid_concentration = None
+        (self.stock_values, self.a, self.b, self.c, self.theta, self.A, self.M,
+         self.M_implicit) = _discretization(float(self.sigma), float(self.interest_rate), float(self.deltaT),
+                                            float(max_stock_price), int(num_stock_steps), grid_type, strike,
+                                            grid_concentration, PDE_method, int(rannacher_steps))
 
-        stock_values = np.linspace(0, max_stock_price, num_stock_steps + 1)
+    @stage
+    def _set_terminal_condition(self, option_type):
+        """Set the terminal condition for the option."""
 
         if 'P' in option_type:
-            self.grid[:, -1] = np.maximum(self.strike - stock_values, 0)
+            self.grid[:, -1] = np.maximum(self.strike - self.stock_values, 0)
         else:
-            self.grid[:, -1] = np.maximum(stock_values - self.strike, 0)
+            self.grid[:, -1] = np.maximum(self.stock_values - self.strike, 0)
 
+    @stage
     def _set_boundary_condition(self, option_type, max_stock_price):
         """Set the boundary conditionum_stock_steps for the option."""
 
+        # Column n of the grid is time n * deltaT, so the strike is discounted over the remaining num_steps - n steps
+        discounted_strike = self.strike * np.exp(-self.interest_rate * self.deltaT * np.arange(self.num_steps, -1, -1))
+        if 'A' in option_type:
+            # Early exercise keeps the American boundary values at or above the payoff
+            bound = np.maximum if 'P' in option_type else np.minimum
+            discounted_strike = bound(discounted_strike, self.strike)
         if 'P' in option_type:
-            self.grid[0, :] = self.strike * np.exp(-self.interest_rate * self.deltaT * np.arange(self.num_steps + 1))
+            self.grid[0, :] = discounted_strike
             self.grid[-1, :] = np.zeros(self.num_steps + 1)
         else:
             self.grid[0, :] = np.zeros(self.num_steps + 1)
-            self.grid[-1, :] = max_stock_price - self.strike * np.exp(-self.interest_rate * self.deltaT * np.arange(self.num_steps + 1))
+            self.grid[-1, :] = max_stock_price - discounted_strike
 
-    def _set_coefficient(self, PDE_method):
-        """Set the coefficients for the finite difference method."""
+    def _theta_rhs(self, i, theta):
+        """Right-hand side of a theta-scheme step from time level i to i - 1 (theta = 1 implicit, 0.5 Crank-Nicolson)."""
 
-        drift = self.interest_rate * np.arange(1, self.num_stock_steps) * self.deltaT
-        diffusion_square = (self.sigma * np.arange(1, self.num_stock_steps))**2 * self.deltaT
+        rhs = self.grid[1 : -1, i].copy()
+        if theta < 1.:
+            rhs += (1. - theta) * self.A.dot(self.grid[1 : -1, i])
 
-        self.a = 0.5 * (diffusion_square - drift)
-        self.b = - diffusion_square if PDE_method == 'explicit' else - (diffusion_square + self.interest_rate * self.deltaT)
-        self.c = 0.5 * (diffusion_square + drift)
+        # Boundary values enter the right-hand side of the first and last rows, weighted between the two time levels
+        rhs[0] += self.a[0] * (theta * self.grid[0, i - 1] + (1. - theta) * self.grid[0, i])
+        rhs[-1] += self.c[-1] * (theta * self.grid[-1, i - 1] + (1. - theta) * self.grid[-1, i])
+        return rhs
 
-    def _set_matrix(self, PDE_method):
-        """Set up the matrix for solving the partial differential equation."""
+    def _constrained_step(self, i, theta, option_type, american_method):
+        """Take one theta-scheme step whose linear system is solved subject to the early exercise constraint."""
 
-        A = sp.diags([self.a[1:], self.b, self.c[:-1]], [-1, 0, 1],  format='csc')
-        I = sp.eye(self.num_stock_steps - 1, format='csc')
-        if PDE_method == 'explicit':
-            self.M = (I + A) / (1 + self.interest_rate * self.deltaT)
-        else:
-            self.M = spsolve(I - A, np.eye(self.num_stock_steps - 1))
+        rhs = self._theta_rhs(i, theta)
+        lower, diag, upper = -theta * self.a[1:], 1. - theta * self.b, -theta * self.c[:-1]
+        obstacle = self.grid[1 : -1, -1]
+
+        if american_method == 'brennan-schwartz':
+            return brennan_schwartz(lower, diag, upper, rhs, obstacle, is_call = 'C' in option_type)
+        # Start from the unconstrained solution, which is already exact wherever it stays above the obstacle
+        solver = self.M_implicit if theta == 1. else self.M
+        return projected_sor(lower, diag, upper, rhs, obstacle, solver.solve(rhs))
 
-    def _solve(self, option_type, PDE_method):
+    @stage
+    def _solve(self, option_type, PDE_method, rannacher_steps = 0, american_method = 'projection'):
         """Solve the partial differential equation."""
 
+        constrained = 'A' in option_type and american_method != 'projection'
+
         for i in range(self.num_steps, 0, -1):
-            U = self.M.dot(self.grid[1 : -1, i])
+            theta = 1. if self.num_steps - i < rannacher_steps else self.theta
             if PDE_method == 'explicit':
+                U = self.M.dot(self.grid[1 : -1, i])
                 U[0] += self.grid[0, i] * self.a[0] / (1 + self.interest_rate * self.deltaT)
                 U[-1] += self.grid[-1, i] * self.c[-1] / (1 + self.interest_rate * self.deltaT)
+            elif constrained:
+                U = self._constrained_step(i, theta, option_type, american_method)
             else:
-                U[0] -=  self.M[0, 0] * self.grid[0, i] * self.a[0] + self.M[0, -1] * self.grid[-1, i] * self.c[-1]
-                U[-1] -= self.M[-1, 0] * self.grid[0, i] * self.a[0] + self.M[-1, -1] * self.grid[-1, i] * self.c[-1]
-            self.grid[1:-1, i - 1] = [max(U[j - 1], self.grid[j, -1]) for j in range(1, self.num_stock_steps)] if 'A' in option_type else U
+                U = (self.M_implicit if theta == 1. else self.M).solve(self._theta_rhs(i, theta))
 
-    def _interpolate(self, max_stock_price):
-        stock_values = np.linspace(0, max_stock_price, self.num_stock_steps + 1)
-        return np.interp(self.current_stock, stock_values, self.grid[:,0])
+            # Early exercise: project onto the payoff (already satisfied by the constrained solvers)
+            self.grid[1:-1, i - 1] = np.maximum(U, self.grid[1 : -1, -1]) if 'A' in option_type else U
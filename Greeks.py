@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import numpy as np
+from BlackScholes import _forward_parameters, _d1_d2, _norm_cdf, _norm_pdf
+
+def black_scholes_greeks(option_type, current_stock, strike, period, volatility, interest_rate):
+    """
+    Calculate closed-form Black-Scholes Greeks for a book of contracts in one vectorized pass.
+
+    European options use the standard formulas. Geometric Asian options are priced as a European
+    option with cost of carry rho = (r - sigma^2 / 6) / 2 and volatility sigma / sqrt(3), so their
+    vega and rho include the dependence of the carry on the volatility and on the interest rate.
+
+    Parameters:
+        option_type (array_like of str): Option type per contract ('EC', 'EP', 'AEC-G' or 'AEP-G').
+        current_stock (array_like): Current stock prices.
+        strike (array_like): Strike prices.
+        period (array_like): Times to maturity of the options.
+        volatility (array_like): Volatilities of the stock.
+        interest_rate (array_like): Risk-free interest rates.
+
+    Returns:
+        dict: Arrays keyed by 'price', 'delta', 'gamma', 'vega', 'theta' and 'rho', with the broadcast shape of the inputs.
+              Theta is the sensitivity to calendar time (per year), vega and rho are per unit change.
+    """
+    option_type = np.asarray(option_type, dtype = str)
+    option_type, current_stock, strike, period, volatility, interest_rate = np.broadcast_arrays(
+        option_type, *(np.asarray(x, dtype = float) for x in (current_stock, strike, period, volatility, interest_rate)))
+
+    valid_option_types = ('EC', 'EP', 'AEC-G', 'AEP-G')
+    if not np.isin(option_type, valid_option_types).all():
+        raise ValueError("Invalid option type")
+
+    is_call = np.isin(option_type, ('EC', 'AEC-G'))
+    is_geometric = np.char.endswith(option_type, '-G')
+
+    forward, sigma, offset = _forward_parameters(option_type, current_stock, strike, period, volatility, interest_rate)
+    d1, d2 = _d1_d2(forward, strike, period, sigma, offset)
+
+    # Cost of carry b and its sensitivities to the volatility and to the interest rate
+    carry = np.where(is_geometric, (interest_rate - volatility ** 2 / 6.) / 2., interest_rate)
+    dcarry_dvol = np.where(is_geometric, -volatility / 6., 0.)
+    dcarry_drate = np.where(is_geometric, 0.5, 1.)
+    dsigma_dvol = np.where(is_geometric, np.sqrt(1. / 3.), 1.)
+
+    sqrt_period = np.sqrt(period)
+    discount_factor = np.exp(-interest_rate * period)
+    carry_factor = np.exp((carry - interest_rate) * period)
+    pdf_d1 = _norm_pdf(d1)
+
+    # Sign convention: N(d) for calls, -N(-d) for puts
+    cdf_d1 = np.where(is_call, _norm_cdf(d1), -_norm_cdf(-d1))
+    cdf_d2 = np.where(is_call, _norm_cdf(d2), -_norm_cdf(-d2))
+
+    price = discount_factor * (forward * cdf_d1 - strike * cdf_d2)
+    delta = carry_factor * cdf_d1
+    gamma = carry_factor * pdf_d1 / (current_stock * sigma * sqrt_period)
+
+    # Partial derivatives with respect to the effective volatility and the cost of carry
+    dprice_dsigma = current_stock * carry_factor * pdf_d1 * sqrt_period
+    dprice_dcarry = period * current_stock * carry_factor * cdf_d1
+
+    vega = dprice_dsigma * dsigma_dvol + dprice_dcarry * dcarry_dvol
+    rho = -period * price + dprice_dcarry * dcarry_drate
+    theta = -(-interest_rate * price + carry * current_stock * carry_factor * cdf_d1
+              + current_stock * carry_factor * pdf_d1 * sigma / (2. * sqrt_period))
+
+    return {'price': price, 'delta': delta, 'gamma': gamma, 'vega': vega, 'theta': theta, 'rho': rho}
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+import numpy as np
+from BlackScholes import _d1_d2, _norm_cdf, _norm_pdf
+from BinomialTree import BatchOptionPricer
+
+MIN_VOLATILITY = 1.e-6  # Lower end of the search bracket
+MAX_VOLATILITY = 5.     # Upper end of the search bracket
+
+def _broadcast_quotes(option_type, price, current_stock, strike, period, interest_rate, valid_option_types):
+    """Broadcast a quote set against each other, validate the option types and flatten it."""
+
+    option_type = np.asarray(option_type, dtype = str)
+    option_type, price, current_stock, strike, period, interest_rate = np.broadcast_arrays(
+        option_type, *(np.asarray(x, dtype = float) for x in (price, current_stock, strike, period, interest_rate)))
+
+    if not np.isin(option_type, valid_option_types).all():
+        raise ValueError("Invalid option type")
+
+    return price.shape, [x.ravel() for x in (option_type, price, current_stock, strike, period, interest_rate)]
+
+def _initial_guess(call_price, current_stock, discounted_strike, period):
+    """Corrado-Miller rational approximation of the implied volatility of a European call."""
+
+    moneyness = (current_stock - discounted_strike) / 2.
+    excess = call_price - moneyness
+    root = np.sqrt(np.maximum(excess ** 2 - (current_stock - discounted_strike) ** 2 / np.pi, 0.))
+    guess = np.sqrt(2. * np.pi / period) / (current_stock + discounted_strike) * (excess + root)
+    return np.clip(guess, MIN_VOLATILITY, MAX_VOLATILITY)
+
+def implied_volatility(option_type, price, current_stock, strike, period, interest_rate, tol = 1.e-10, max_iter = 100):
+    """
+    Invert the Black-Scholes formula for a whole set of European quotes at once.
+
+    Every quote starts from a rational initial guess and takes Newton steps with the analytic vega. The
+    search keeps a bracket per quote that is tightened by the sign of each pricing error; a Newton step that
+    leaves the bracket (e.g. deep out of the money, where the vega vanishes) is replaced by bisection.
+    Calls and puts are inverted directly, so deep in-the-money puts keep their precision. All arguments are
+    broadcast against each other.
+
+    Parameters:
+        option_type (array_like of str): Option type per quote ('EC' or 'EP').
+        price (array_like): Quoted option prices.
+        current_stock (array_like): Current stock prices.
+        strike (array_like): Strike prices.
+        period (array_like): Times to maturity of the options.
+        interest_rate (array_like): Risk-free interest rates.
+        tol (float): Tolerance on the implied volatility.
+        max_iter (int): Maximum number of iterations.
+
+    Returns:
+        np.ndarray: Implied volatilities with the broadcast shape of the inputs; NaN where the quote violates
+                    the no-arbitrage bounds or the period, stock or strike is not positive.
+    """
+    shape, (option_type, price, current_stock, strike, period, interest_rate) = _broadcast_quotes(
+        option_type, price, current_stock, strike, period, interest_rate, ('EC', 'EP'))
+
+    discounted_strike = strike * np.exp(-interest_rate * period)
+    sign = np.where(option_type == 'EC', 1., -1.)
+    intrinsic = np.maximum(sign * (current_stock - discounted_strike), 0.)
+    ceiling = np.where(option_type == 'EC', current_stock, discounted_strike)
+
+    volatility = np.full(len(price), np.nan)
+    active = np.flatnonzero((price > intrinsic) & (price < ceiling) & (period > 0) & (current_stock > 0) & (strike > 0))
+    sign, price, stock, discounted_strike, period = (x[active] for x in
+        (sign, price, current_stock, discounted_strike, period))
+
+    # Puts enter the initial guess through put-call parity
+    sigma = _initial_guess(price + (sign < 0) * (stock - discounted_strike), stock, discounted_strike, period)
+    lower = np.full(len(active), MIN_VOLATILITY)
+    upper = np.full(len(active), MAX_VOLATILITY)
+
+    for _ in range(max_iter):
+        if not len(active):
+            break
+
+        # With the discounted strike, the forward / strike ratio is current_stock / discounted_strike
+        d1, d2 = _d1_d2(stock, discounted_strike, period, sigma)
+        error = sign * (stock * _norm_cdf(sign * d1) - discounted_strike * _norm_cdf(sign * d2)) - price
+        vega = stock * _norm_pdf(d1) * np.sqrt(period)
+
+        # The price increases with the volatility, so the error tells on which side the root lies
+        upper = np.where(error > 0, sigma, upper)
+        lower = np.where(error < 0, sigma, lower)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            update = sigma - error / vega
+        update = np.where((update > lower) & (update < upper), update, 0.5 * (lower + upper))
+
+        converged = (np.abs(update - sigma) < tol) | (upper - lower < tol)
+        volatility[active[converged]] = update[converged]
+
+        keep = ~converged
+        active, sign, price, stock, discounted_strike, period = (x[keep] for x in
+            (active, sign, price, stock, discounted_strike, period))
+        sigma, lower, upper = update[keep], lower[keep], upper[keep]
+
+    return volatility.reshape(shape)
+
+def american_implied_volatility(option_type, price, current_stock, strike, period, interest_rate, N = 200,
+                                tol = 1.e-6, max_iter = 100):
+    """
+    Invert the binomial tree for a whole set of (American) quotes at once.
+
+    Each iteration prices every unconverged quote with one BatchOptionPricer sweep. The root is bracketed
+    between MIN_VOLATILITY and MAX_VOLATILITY and found with the Illinois variant of regula falsi, which
+    converges superlinearly without derivatives. All arguments except N are broadcast against each other.
+
+    Parameters:
+        option_type (array_like of str): Option type per quote ('EC', 'EP', 'AC' or 'AP').
+        price (array_like): Quoted option prices.
+        current_stock (array_like): Current stock prices.
+        strike (array_like): Strike prices.
+        period (array_like): Times to maturity of the options.
+        interest_rate (array_like): Risk-free interest rates.
+        N (int): Number of steps in the binomial tree.
+        tol (float): Tolerance on the implied volatility.
+        max_iter (int): Maximum number of iterations.
+
+    Returns:
+        np.ndarray: Implied volatilities with the broadcast shape of the inputs; NaN where the quote cannot be
+                    matched by a volatility inside the bracket or the period, stock or strike is not positive.
+    """
+    shape, (option_type, price, current_stock, strike, period, interest_rate) = _broadcast_quotes(
+        option_type, price, current_stock, strike, period, interest_rate, ('EC', 'EP', 'AC', 'AP'))
+
+    def pricing_error(index, sigma):
+        pricer = BatchOptionPricer(current_stock[index], strike[index], N, period[index], sigma, interest_rate[index])
+        return pricer.calculate_option_price(option_type[index]) - price[index]
+
+    volatility = np.full(len(price), np.nan)
+    active = np.flatnonzero((period > 0) & (current_stock > 0) & (strike > 0))
+    # The risk-neutral probability stays in [0, 1] only while sigma * sqrt(dt) exceeds |r| * dt
+    lower = np.maximum(MIN_VOLATILITY, 1.01 * np.abs(interest_rate[active]) * np.sqrt(period[active] / N))
+    upper = np.full(len(active), MAX_VOLATILITY)
+    error_lower = pricing_error(active, lower)
+    error_upper = pricing_error(active, upper)
+
+    # Keep the quotes whose root is bracketed
+    keep = (error_lower <= 0) & (error_upper >= 0)
+    active, lower, upper, error_lower, error_upper = (x[keep] for x in (active, lower, upper, error_lower, error_upper))
+    side = np.zeros(len(active), dtype = int)
+    previous = np.full(len(active), np.nan)
+
+    for _ in range(max_iter):
+        if not len(active):
+            break
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            sigma = (lower * error_upper - upper * error_lower) / (error_upper - error_lower)
+        sigma = np.where(np.isfinite(sigma), sigma, 0.5 * (lower + upper))
+        error = pricing_error(active, sigma)
+
+        # Replace the end point on the side of the new estimate; halve the stale end's error when the same
+        # side is replaced twice in a row (the Illinois modification)
+        above = error > 0
+        error_lower = np.where(above & (side == 1), 0.5 * error_lower, error_lower)
+        error_upper = np.where(~above & (side == -1), 0.5 * error_upper, error_upper)
+        upper, error_upper = np.where(above, sigma, upper), np.where(above, error, error_upper)
+        lower, error_lower = np.where(above, lower, sigma), np.where(above, error_lower, error)
+        side = np.where(above, 1, -1)
+
+        converged = (error == 0) | (upper - lower < tol) | (np.abs(sigma - previous) < tol)
+        volatility[active[converged]] = sigma[converged]
+
+        keep = ~converged
+        active, lower, upper, error_lower, error_upper, side, previous = (x[keep] for x in
+            (active, lower, upper, error_lower, error_upper, side, sigma))
+
+    return volatility.reshape(shape)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+import tracemalloc
+from functools import wraps
+from time import perf_counter
+
+def stage(method):
+    """
+    Decorator marking a pricer method as an instrumented stage.
+
+    While profiling is disabled the wrapper only checks one attribute before calling the method.
+
+    Parameters:
+    method (callable): Method of an Instrumented class.
+
+    Returns:
+    callable: Wrapped method.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profile = self._profile
+        if profile is None:
+            return method(self, *args, **kwargs)
+        return profile.record(name, method, self, args, kwargs)
+    return wrapper
+
+class Profile:
+    """Call counts, wall times and peak traced memory per stage of one pricer."""
+
+    def __init__(self, track_memory = False):
+        """
+        Initialize an empty Profile.
+
+        Parameters:
+        track_memory (bool): Whether to record the peak memory of each stage with tracemalloc.
+        """
+
+        self.track_memory = track_memory
+        self.stages = {}
+        self._stack = []
+
+    def record(self, name, method, instance, args, kwargs):
+        """Call a stage method and add its wall time and peak memory to the statistics of the stage."""
+
+        entry = self.stages.setdefault(name, {'calls': 0, 'time': 0., 'peak_memory': 0 if self.track_memory else None})
+        if self.track_memory:
+            self._enter()
+
+        start_time = perf_counter()
+        try:
+            return method(instance, *args, **kwargs)
+        finally:
+            entry['time'] += perf_counter() - start_time
+            entry['calls'] += 1
+            if self.track_memory:
+                entry['peak_memory'] = max(entry['peak_memory'], self._exit())
+
+    def _enter(self):
+        """Start measuring the peak memory of a stage, saving the peak seen so far by the enclosing stage."""
+
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._stack.append([current, current])
+
+    def _exit(self):
+        """Finish measuring a stage and return its peak memory above the level at which it started."""
+
+        peak = tracemalloc.get_traced_memory()[1]
+        start, seen = self._stack.pop()
+        peak = max(peak, seen)
+        if self._stack:
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        return peak - start
+
+class Instrumented:
+    """
+    Mixin giving a pricer opt-in, per-stage profiling of the methods decorated with stage.
+
+    Stage times include the time spent in nested stages. Stages run in worker processes (the parallel
+    Monte Carlo pricers) are recorded on the workers' copies of the pricer and do not appear in the report.
+    """
+
+    _profile = None
+
+    def enable_profiling(self, track_memory = False):
+        """
+        Start recording stage statistics, discarding any earlier ones.
+
+        Parameters:
+        track_memory (bool): Also record the peak memory of each stage (NumPy arrays included). This starts
+                             tracemalloc if it is not running, which slows down allocation-heavy code.
+        """
+
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._profile = Profile(track_memory)
+
+    def disable_profiling(self):
+        """Stop recording stage statistics and stop tracemalloc if enable_profiling started it."""
+
+        if getattr(self, '_started_tracing', False):
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._profile = None
+
+    def profile_report(self):
+        """
+        Return the statistics recorded since profiling was enabled.
+
+        Returns:
+        dict: Per stage name, a dict with 'calls', 'time' (total seconds) and 'peak_memory' (bytes above the
+              level at the start of the stage, None unless memory is tracked). Empty when profiling is disabled.
+        """
+
+        if self._profile is None:
+            return {}
+        return {name: dict(entry) for name, entry in self._profile.stages.items()}
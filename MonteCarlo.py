@@ -1,13 +1,351 @@
 #!/usr/bin/env python3
 import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from statistics import NormalDist
+from BlackScholes import black_scholes
+from Instrumentation import Instrumented, stage
 
 # Global constant for polynomial degree
 POLYDEGREE = 3
 
-class OptionPricer:
+# Regression bases available for the Longstaff-Schwartz continuation value
+BASES = ('power', 'laguerre')
+
+# Variance reduction techniques, any combination of which may be requested
+VARIANCE_REDUCTIONS = ('antithetic', 'moment_matching', 'control_variate')
+
+# Samplers for the normal draws: pseudo-random or scrambled Sobol (quasi-random)
+SAMPLERS = ('pseudo', 'sobol')
+
+def variance_reduction_modes(variance_reduction):
+    """Normalize a variance reduction request (None, a technique name or a sequence of names) to a set."""
+
+    if variance_reduction is None:
+        return frozenset()
+    modes = frozenset([variance_reduction] if isinstance(variance_reduction, str) else variance_reduction)
+    if not modes <= set(VARIANCE_REDUCTIONS):
+        raise ValueError("Invalid variance reduction")
+    return modes
+
+def brownian_bridge(normals):
+    """
+    Turn independent standard normals into Brownian increments built by a Brownian bridge.
+
+    The first row fixes the end point of the path and each following row fills in the midpoint of an
+    existing interval (breadth first), so the leading rows carry most of the path variance. This keeps
+    the effective dimension of quasi-random points low.
+
+    Parameters:
+    normals (np.ndarray): Independent standard normals of shape (N, iterations).
+
+    Returns:
+    np.ndarray: Standardized increments of shape (N, iterations), i.e. W(k + 1) - W(k) on a unit time grid.
+    """
+    N = len(normals)
+    W = np.zeros((N + 1, normals.shape[1]))
+    W[N] = np.sqrt(N) * normals[0]
+
+    k = 1
+    intervals = [(0, N)]
+    while intervals:
+        refined = []
+        for left, right in intervals:
+            if right - left < 2:
+                continue
+            mid = (left + right) // 2
+            W[mid] = ((right - mid) * W[left] + (mid - left) * W[right]) / (right - left) \
+                + np.sqrt((mid - left) * (right - mid) / (right - left)) * normals[k]
+            k += 1
+            refined += [(left, mid), (mid, right)]
+        intervals = refined
+
+    return np.diff(W, axis = 0)
+
+def standard_normals(rng, shape, modes, sampler = 'pseudo'):
+    """
+    Draw standard normals for a batch of paths, with paths along the last axis.
+
+    With antithetic sampling the second half of the paths mirrors the first half, so the number of
+    paths is rounded up to an even number. With moment matching each row is shifted and scaled to
+    exactly zero mean and unit variance across paths. The Sobol sampler maps scrambled Sobol points
+    (scrambling seeded from rng) through the inverse normal CDF and builds multi-step paths with a
+    Brownian bridge; the number of points is rounded up to a power of two.
+
+    Parameters:
+    rng (np.random.Generator): Random number generator.
+    shape (tuple): Requested shape, the last entry being the number of paths.
+    modes (frozenset): Variance reduction techniques.
+    sampler (str): 'pseudo' or 'sobol'.
+
+    Returns:
+    np.ndarray: Standard normals.
+    """
+    count = (shape[-1] + 1) // 2 if 'antithetic' in modes else shape[-1]
+
+    if sampler == 'sobol':
+        # scipy.stats is slow to import, so load it only for quasi-Monte Carlo runs
+        from scipy.stats import norm, qmc
+        dimension = int(np.prod(shape[:-1]))
+        points = qmc.Sobol(d = dimension, scramble = True, seed = rng).random_base2(max(count - 1, 1).bit_length())
+        normals = norm.ppf(np.clip(points.T, 1e-16, 1. - 1e-16))
+        if dimension > 1:
+            normals = brownian_bridge(normals)
+        normals = normals.reshape(shape[:-1] + (normals.shape[-1],))
+    else:
+        normals = rng.standard_normal(shape[:-1] + (count,))
+
+    if 'antithetic' in modes:
+        normals = np.concatenate((normals, -normals), axis = -1)
+
+    if 'moment_matching' in modes:
+        normals -= normals.mean(axis = -1, keepdims = True)
+        normals /= normals.std(axis = -1, keepdims = True)
+    return normals
+
+def control_variate(values, control, control_mean):
+    """Adjust per-path values with a control of known mean, using the regression-optimal coefficient."""
+
+    control_deviation = control - np.mean(control)
+    variance = np.dot(control_deviation, control_deviation)
+    beta = np.dot(values - np.mean(values), control_deviation) / variance if variance > 0 else 0.
+    return values - beta * (control - control_mean)
+
+def antithetic_average(values):
+    """Average each path with its antithetic partner, giving independent samples."""
+
+    half = len(values) // 2
+    return (values[:half] + values[half:]) / 2.
+
+def reduce_variance(values, modes, control = None, control_mean = None):
+    """
+    Turn per-path values into the independent samples that are averaged.
+
+    Antithetic partners are averaged first, for the values and the control alike, and the control
+    variate is then fitted on the pair averages: these keep only the even part of the payoff, whose
+    relation to the control differs from that of the per-path values.
+
+    Parameters:
+    values (np.ndarray): Discounted value of each path.
+    modes (frozenset): Variance reduction techniques.
+    control (np.ndarray): Discounted control of each path (None without a control variate).
+    control_mean (float): Known mean of the control.
+
+    Returns:
+    np.ndarray: Samples, one per path or per antithetic pair.
+    """
+    if 'antithetic' in modes:
+        values = antithetic_average(values)
+        if control is not None:
+            control = antithetic_average(control)
+    if control is not None:
+        values = control_variate(values, control, control_mean)
+    return values
+
+def regression_basis(x, basis, degree):
+    """
+    Build the regression design matrix for the Longstaff-Schwartz continuation value.
+
+    Parameters:
+    x (np.ndarray): Regression state (stock price or average), scaled to be of order one.
+    basis (str): Type of basis ('power' for monomials, 'laguerre' for weighted Laguerre polynomials).
+    degree (int): Highest polynomial degree.
+
+    Returns:
+    np.ndarray: Design matrix of shape (len(x), degree + 1).
+    """
+    if basis == 'power':
+        return np.vander(x, degree + 1)
+    return np.exp(-x / 2.)[:, None] * np.polynomial.laguerre.lagvander(x, degree)
+
+def least_squares_induction(states, payoff, discount_factor, basis, degree, scale):
+    """
+    Run Longstaff-Schwartz backward induction over a matrix of simulated paths.
+
+    Parameters:
+    states (np.ndarray): Regression states of shape (N + 1, iterations).
+    payoff (np.ndarray): Exercise values of shape (N + 1, iterations).
+    discount_factor (float): One-step discount factor.
+    basis (str): Type of regression basis ('power' or 'laguerre').
+    degree (int): Highest polynomial degree of the regression basis.
+    scale (float): Scale the states are divided by before building the basis.
+
+    Returns:
+    np.ndarray: Cash flow of each path, discounted to the first step.
+    """
+    Y = payoff[-1].copy()
+
+    for i in range(len(payoff) - 2, 0, -1):
+        hold = np.flatnonzero(payoff[i] > 0)
+        Y *= discount_factor
+
+        if len(hold) > degree:
+            # Apply Least square method
+            X = regression_basis(states[i, hold] / scale, basis, degree)
+            regression = np.linalg.lstsq(X, Y[hold], rcond = None)[0]
+            CY = X @ regression
+
+            # Whether to exercise now
+            exercise = hold[payoff[i, hold] > CY]
+            Y[exercise] = payoff[i, exercise]
+    return Y
+
+class RunningStatistics:
+    """Welford accumulator of the mean and variance of a stream of samples, updated chunk by chunk."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.
+        self.m2 = 0.
+
+    def update(self, values):
+        """Merge a chunk of samples into the running statistics."""
+
+        if len(values) == 0:
+            return
+        mean = np.mean(values)
+        self._merge(len(values), mean, np.sum((values - mean) ** 2))
+
+    def merge(self, other):
+        """Merge the statistics accumulated by another RunningStatistics object."""
+
+        if other.count == 0:
+            return
+        self._merge(other.count, other.mean, other.m2)
+
+    def _merge(self, count, mean, m2):
+        """Chan et al. pairwise update of the count, mean and sum of squared deviations."""
+
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.inf
+
+    @property
+    def standard_error(self):
+        return np.sqrt(self.variance / self.count) if self.count > 1 else np.inf
+
+def _simulate_chunk(simulate, iterations, seed_sequence):
+    """Simulate one chunk of paths with its own random stream and return its statistics."""
+
+    stats = RunningStatistics()
+    stats.update(simulate(iterations, np.random.default_rng(seed_sequence)))
+    return stats
+
+def stream_option_price(simulate, chunk_size, max_iterations, tolerance, confidence, seed = None):
+    """
+    Price an option from chunks of simulated path values, stopping once the estimate is accurate enough.
+
+    Chunk k draws from the k-th child of numpy.random.SeedSequence(seed), so for a given seed the
+    chunks are identical to those of parallel_option_price.
+
+    Parameters:
+    simulate (callable): Function simulate(iterations, rng) returning the discounted values of new paths.
+    chunk_size (int): Number of paths simulated per chunk.
+    max_iterations (int): Maximum total number of paths.
+    tolerance (float): Target half-width of the confidence interval, or None to run all max_iterations paths.
+    confidence (float): Confidence level of the interval.
+    seed (int): Seed of the random streams (None for fresh entropy).
+
+    Returns:
+    tuple: Option price, its standard error and the number of paths used.
+    """
+    if max_iterations < 1:
+        raise ValueError("Invalid number of iterations")
+
+    if chunk_size < 1:
+        raise ValueError("Invalid chunk size")
+
+    z = NormalDist().inv_cdf((1. + confidence) / 2.)
+    seed_sequence = np.random.SeedSequence(seed)
+    stats = RunningStatistics()
+    iterations = 0
+
+    while iterations < max_iterations:
+        chunk = min(chunk_size, max_iterations - iterations)
+        stats.merge(_simulate_chunk(simulate, chunk, seed_sequence.spawn(1)[0]))
+        iterations += chunk
+        if tolerance is not None and z * stats.standard_error <= tolerance:
+            break
+
+    return stats.mean, stats.standard_error, iterations
+
+def rqmc_option_price(simulate, iterations, replications, seed = None):
+    """
+    Price an option with randomized quasi-Monte Carlo.
+
+    Each replication uses an independently scrambled Sobol point set; the spread of the replication
+    means gives the error estimate.
+
+    Parameters:
+    simulate (callable): Function simulate(iterations, rng) returning the discounted values of Sobol paths
+                         whose scrambling is seeded from rng.
+    iterations (int): Number of paths per replication.
+    replications (int): Number of independent scramblings.
+    seed (int): Seed of the scramblings (None for fresh entropy).
+
+    Returns:
+    tuple: Option price and its standard error.
+    """
+    if iterations < 1:
+        raise ValueError("Invalid number of iterations")
+
+    if replications < 2:
+        raise ValueError("Invalid number of replications")
+
+    means = np.array([np.mean(simulate(iterations, np.random.default_rng(seed_sequence)))
+                      for seed_sequence in np.random.SeedSequence(seed).spawn(replications)])
+    return np.mean(means), np.std(means, ddof = 1) / np.sqrt(replications)
+
+def parallel_option_price(simulate, iterations, chunk_size, seed = None, workers = None):
+    """
+    Price an option from chunks of simulated path values spread over a process pool.
+
+    The paths are split into fixed-size chunks, each drawing from its own child of
+    numpy.random.SeedSequence(seed), and the chunk statistics are merged in chunk order. The result
+    therefore depends only on the seed, the number of paths and the chunk size, not on the number of workers.
+
+    Parameters:
+    simulate (callable): Picklable function simulate(iterations, rng) returning the discounted values of new paths.
+    iterations (int): Total number of paths.
+    chunk_size (int): Number of paths simulated per chunk.
+    seed (int): Seed of the random streams (None for fresh entropy).
+    workers (int): Number of worker processes (None for all cores, 1 to run in this process).
+
+    Returns:
+    tuple: Option price and its standard error.
+    """
+    if iterations < 1:
+        raise ValueError("Invalid number of iterations")
+
+    if chunk_size < 1:
+        raise ValueError("Invalid chunk size")
+
+    sizes = [chunk_size] * (iterations // chunk_size) + ([iterations % chunk_size] if iterations % chunk_size else [])
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = workers or os.cpu_count()
+
+    stats = RunningStatistics()
+    if workers == 1:
+        for chunk in map(partial(_simulate_chunk, simulate), sizes, seed_sequences):
+            stats.merge(chunk)
+    else:
+        with ProcessPoolExecutor(max_workers = min(workers, len(sizes))) as pool:
+            for chunk in pool.map(partial(_simulate_chunk, simulate), sizes, seed_sequences):
+                stats.merge(chunk)
+
+    return stats.mean, stats.standard_error
+
+class OptionPricer(Instrumented):
     """Class to calculate option prices using a binomial tree approach."""
 
-    def __init__(self, current_stock, strike, N, period, volatility, interest_rate):
+    def __init__(self, current_stock, strike, N, period, volatility, interest_rate, seed = None):
         """
         Initialize the OptionPricer object with parameters.
 
@@ -18,6 +356,7 @@ class OptionPricer:
         period (float): Period to maturity.
         volatility (float): Volatility of the stock.
         interest_rate (float): Risk-free interest rate.
+        seed (int): Seed of the random number generator (None for fresh entropy).
         """
 
         self.N = N
@@ -29,63 +368,175 @@ class OptionPricer:
         self.deltaT = period / N
         self.interest_rate = interest_rate
         self.discount_factor = np.exp(-interest_rate * (period / N))
+        self.rng = np.random.default_rng(seed)
 
-    def calculate_option_price(self, option_type, iterations):
+    @stage
+    def calculate_option_price(self, option_type, iterations, basis = 'power', degree = POLYDEGREE, variance_reduction = None):
         """
         Calculate the option price based on the specified option type and number of iterations.
 
         Parameters:
         option_type (str): Type of option ('EC', 'EP', 'AC', 'AP').
         iterations (int): Number of iterations for simulation.
+        basis (str): Regression basis for American options ('power' or 'laguerre').
+        degree (int): Highest polynomial degree of the regression basis.
+        variance_reduction (str or tuple): Any of 'antithetic', 'moment_matching' and 'control_variate'.
+                                           The control is the discounted terminal stock price for European
+                                           options and the Black-Scholes priced European payoff for American ones.
 
         Returns:
         float: Option price.
         """
+        self._validate(option_type, basis, variance_reduction)
+        return np.mean(self._simulate_values(option_type, iterations, basis = basis, degree = degree, variance_reduction = variance_reduction))
+
+    @stage
+    def calculate_option_price_streaming(self, option_type, chunk_size = 100000, max_iterations = 10000000,
+                                         tolerance = None, confidence = 0.95, basis = 'power', degree = POLYDEGREE, seed = None,
+                                         variance_reduction = None):
+        """
+        Calculate the option price from paths generated and priced in fixed-size chunks.
+
+        Only one chunk of paths is held in memory at a time. For American options each chunk runs its
+        own Longstaff-Schwartz regression.
+
+        Parameters:
+        option_type (str): Type of option ('EC', 'EP', 'AC', 'AP').
+        chunk_size (int): Number of paths per chunk.
+        max_iterations (int): Maximum total number of paths.
+        tolerance (float): Stop once the confidence interval half-width falls below this value (None to run all paths).
+        confidence (float): Confidence level of the interval.
+        basis (str): Regression basis for American options ('power' or 'laguerre').
+        degree (int): Highest polynomial degree of the regression basis.
+        seed (int): Seed of the per-chunk random streams (None for fresh entropy).
+        variance_reduction (str or tuple): Variance reduction techniques (see calculate_option_price).
+
+        Returns:
+        tuple: Option price, its standard error and the number of paths used.
+        """
+        self._validate(option_type, basis, variance_reduction)
+        simulate = partial(self._simulate_values, option_type, basis = basis, degree = degree, variance_reduction = variance_reduction)
+        return stream_option_price(simulate, chunk_size, max_iterations, tolerance, confidence, seed)
+
+    @stage
+    def calculate_option_price_parallel(self, option_type, iterations, seed = None, workers = None, chunk_size = 100000,
+                                        basis = 'power', degree = POLYDEGREE, variance_reduction = None):
+        """
+        Calculate the option price with paths split across a process pool.
+
+        Every chunk of paths draws from its own child stream of the seed, so for a given seed the price
+        is bit-identical whatever the number of workers. For American options each chunk runs its own
+        Longstaff-Schwartz regression.
+
+        Parameters:
+        option_type (str): Type of option ('EC', 'EP', 'AC', 'AP').
+        iterations (int): Total number of paths.
+        seed (int): Seed of the per-chunk random streams (None for fresh entropy).
+        workers (int): Number of worker processes (None for all cores).
+        chunk_size (int): Number of paths per chunk.
+        basis (str): Regression basis for American options ('power' or 'laguerre').
+        degree (int): Highest polynomial degree of the regression basis.
+        variance_reduction (str or tuple): Variance reduction techniques (see calculate_option_price).
+
+        Returns:
+        tuple: Option price and its standard error.
+        """
+        self._validate(option_type, basis, variance_reduction)
+        simulate = partial(self._simulate_values, option_type, basis = basis, degree = degree, variance_reduction = variance_reduction)
+        return parallel_option_price(simulate, iterations, chunk_size, seed, workers)
+
+    @stage
+    def calculate_option_price_qmc(self, option_type, iterations, replications = 16, seed = None,
+                                   basis = 'power', degree = POLYDEGREE, variance_reduction = None):
+        """
+        Calculate the option price with randomized quasi-Monte Carlo (scrambled Sobol points, Brownian bridge paths).
+
+        Parameters:
+        option_type (str): Type of option ('EC', 'EP', 'AC', 'AP').
+        iterations (int): Number of paths per replication, rounded up to a power of two.
+        replications (int): Number of independent scramblings used for the error estimate.
+        seed (int): Seed of the scramblings (None for fresh entropy).
+        basis (str): Regression basis for American options ('power' or 'laguerre').
+        degree (int): Highest polynomial degree of the regression basis.
+        variance_reduction (str or tuple): Variance reduction techniques (see calculate_option_price).
+
+        Returns:
+        tuple: Option price and its standard error.
+        """
+        self._validate(option_type, basis, variance_reduction)
+        simulate = partial(self._simulate_values, option_type, basis = basis, degree = degree, variance_reduction = variance_reduction,
+                           sampler = 'sobol')
+        return rqmc_option_price(simulate, iterations, replications, seed)
+
+    def _validate(self, option_type, basis, variance_reduction):
+        """Check the arguments shared by the calculate_* entry points."""
+
         if option_type not in ('EC', 'EP', 'AC', 'AP'):
             raise ValueError("Invalid option type")
 
+        if basis not in BASES:
+            raise ValueError("Invalid regression basis")
+
+        variance_reduction_modes(variance_reduction)
+
+    @stage
+    def _simulate_values(self, option_type, iterations, rng = None, basis = 'power', degree = POLYDEGREE, variance_reduction = None,
+                         sampler = 'pseudo'):
+        """Simulate the given number of paths and return the discounted value of each (or of each antithetic pair)."""
+
+        modes = variance_reduction_modes(variance_reduction)
+        rng = self.rng if rng is None else rng
+        maturity_discount = np.exp(-self.interest_rate * self.period)
+
+        control = control_mean = None
+
         if option_type in ('AC', 'AP'):
-            stock_prices = self._generate_random_path(iterations)
-            return self._backward_induction(stock_prices, is_call=(option_type == 'AC'), iterations = iterations)
+            stock_prices = self._generate_random_path(standard_normals(rng, (self.N, iterations), modes, sampler))
+            values = self._backward_induction(stock_prices, is_call=(option_type == 'AC'), basis = basis, degree = degree)
+            if 'control_variate' in modes:
+                european_type = 'EC' if option_type == 'AC' else 'EP'
+                terminal = stock_prices[-1]
+                control = (np.maximum(terminal - self.strike, 0) if option_type == 'AC' else np.maximum(self.strike - terminal, 0)) * maturity_discount
+                control_mean = black_scholes(european_type, self.current_stock, self.strike, self.period, self.sigma, self.interest_rate)
         else:
-            stock_prices = self._generate_random_payoff(iterations)
-            res = np.mean([max(price - self.strike, 0) if option_type == 'EC' else max(self.strike - price, 0) for price in stock_prices])
-            return res * np.exp(-self.interest_rate * self.period)
+            stock_prices = self._generate_random_payoff(standard_normals(rng, (iterations,), modes, sampler))
+            values = np.maximum(stock_prices - self.strike, 0) if option_type == 'EC' else np.maximum(self.strike - stock_prices, 0)
+            values = values * maturity_discount
+            if 'control_variate' in modes:
+                control, control_mean = stock_prices * maturity_discount, self.current_stock
+
+        return reduce_variance(values, modes, control, control_mean)
 
-    def _generate_random_payoff(self, iterations):
+    @stage
+    def _generate_random_payoff(self, randomwalk):
 
-        randomwalk = np.random.normal(0, 1, size = iterations)
         stock_prices = self.current_stock * np.exp(self.mu * self.period + self.sigma * self.period ** 0.5 * randomwalk)
         return stock_prices
 
-    def _generate_random_path(self, iterations):
-
-        randomwalk = np.random.normal(0, 1, size = iterations)
-        #stock_prices = [list(self.current_stock * np.exp(self.mu * self.deltaT + self.sigma * self.deltaT ** 0.5 * randomwalk))]
-        stock_prices = [self.current_stock * np.ones(iterations)]
+    @stage
+    def _generate_random_path(self, randomwalk):
+        """
+        Generate stock price paths for all iterations at once.
 
-        for i in range(self.N):
-            randomwalk = np.random.normal(0, 1, size = iterations)
-            stock_prices.append(list(stock_prices[-1] * np.exp(self.mu * self.deltaT + self.sigma * self.deltaT ** 0.5 * randomwalk)))
-        return stock_prices
+        Parameters:
+        randomwalk (np.ndarray): Standard normals of shape (N, iterations).
 
-    def _backward_induction(self, stock_prices, is_call, iterations):
+        Returns:
+        np.ndarray: Stock prices of shape (N + 1, iterations); row i holds the prices after i steps.
+        """
+        stock_prices = np.empty((self.N + 1, randomwalk.shape[1]))
+        stock_prices[0] = 0.
 
-        stock_prices = np.array(stock_prices)
-        payoff = np.array([[max(stock_prices[i][j] - self.strike, 0.) if is_call else max(self.strike - stock_prices[i][j], 0.)
-                            for j in range(iterations)] for i in range(self.N + 1)])
-        Y = payoff[self.N]
+        # Log-price increments, accumulated into the rows after the initial one
+        increments = self.sigma * self.deltaT ** 0.5 * randomwalk + self.mu * self.deltaT
+        np.cumsum(increments, axis = 0, out = stock_prices[1:])
 
-        for i in range(self.N - 1, 0, -1):
-            X = stock_prices[i]
-            hold = np.where(payoff[i] > 0)
-            Y *= self.discount_factor
+        np.exp(stock_prices, out = stock_prices)
+        stock_prices *= self.current_stock
+        return stock_prices
 
-            if len(hold[0]) > POLYDEGREE:
-                # Apply Least square method
-                regression = np.polyfit(X[hold], Y[hold], POLYDEGREE)
-                CY = np.polyval(regression, X[hold])
+    @stage
+    def _backward_induction(self, stock_prices, is_call, basis = 'power', degree = POLYDEGREE):
 
-                # Whether to exercise now
-                Y[hold] = np.where(payoff[i][hold] > CY, payoff[i][hold], Y[hold])
-        return np.mean(Y)
+        payoff = np.maximum(stock_prices - self.strike, 0.) if is_call else np.maximum(self.strike - stock_prices, 0.)
+        return least_squares_induction(stock_prices, payoff, self.discount_factor, basis, degree, self.strike)
@@ -1,14 +1,15 @@
 #!/usr/bin/env python3
 import numpy as np
-import copy
+from functools import partial
+from BlackScholes import discrete_geometric_asian
+from MonteCarlo import POLYDEGREE, BASES, least_squares_induction, stream_option_price, parallel_option_price, rqmc_option_price
+from MonteCarlo import variance_reduction_modes, standard_normals, reduce_variance
+from Instrumentation import Instrumented, stage
 
-# Global constant for polynomial degree
-POLYDEGREE = 3
-
-class AsianOptionPricer:
+class AsianOptionPricer(Instrumented):
     """Class to calculate option prices using a binomial tree approach."""
 
-    def __init__(self, current_stock, strike, N, period, volatility, interest_rate):
+    def __init__(self, current_stock, strike, N, period, volatility, interest_rate, seed = None):
         """
         Initialize the OptionPricer object with parameters.
 
@@ -19,6 +20,7 @@ class AsianOptionPricer:
         period (float): Period to maturity.
         volatility (float): Volatility of the stock.
         interest_rate (float): Risk-free interest rate.
+        seed (int): Seed of the random number generator (None for fresh entropy).
         """
 
         self.N = N
@@ -30,67 +32,197 @@ class AsianOptionPricer:
         self.deltaT = period / N
         self.interest_rate = interest_rate
         self.discount_factor = np.exp(-interest_rate * (period / N))
+        self.rng = np.random.default_rng(seed)
 
-    def calculate_asian_option_price(self, option_type, iterations, average_method):
+    @stage
+    def calculate_asian_option_price(self, option_type, iterations, average_method, basis = 'power', degree = POLYDEGREE,
+                                     variance_reduction = None):
         """
         Calculate the option price based on the specified option type and number of iterations.
 
         Parameters:
         option_type (str): Type of option ('EC', 'EP', 'AC', 'AP').
         iterations (int): Number of iterations for simulation.
+        average_method (str): Method for averaging ('arithmetic' or 'geometric').
+        basis (str): Regression basis for American options ('power' or 'laguerre').
+        degree (int): Highest polynomial degree of the regression basis.
+        variance_reduction (str or tuple): Any of 'antithetic', 'moment_matching' and 'control_variate'.
+                                           For arithmetic averages the control is the geometric average
+                                           European payoff, priced in closed form for the same monitoring
+                                           dates; for geometric averages it is the discounted terminal stock price.
 
         Returns:
         float: Option price.
         """
+        self._validate(option_type, average_method, basis, variance_reduction)
+        return np.mean(self._simulate_values(option_type, iterations, average_method = average_method, basis = basis, degree = degree,
+                                             variance_reduction = variance_reduction))
+
+    @stage
+    def calculate_asian_option_price_streaming(self, option_type, average_method, chunk_size = 100000, max_iterations = 10000000,
+                                               tolerance = None, confidence = 0.95, basis = 'power', degree = POLYDEGREE, seed = None,
+                                               variance_reduction = None):
+        """
+        Calculate the option price from paths generated and priced in fixed-size chunks.
+
+        Only one chunk of paths is held in memory at a time. For American options each chunk runs its
+        own Longstaff-Schwartz regression.
+
+        Parameters:
+        option_type (str): Type of option ('EC', 'EP', 'AC', 'AP').
+        average_method (str): Method for averaging ('arithmetic' or 'geometric').
+        chunk_size (int): Number of paths per chunk.
+        max_iterations (int): Maximum total number of paths.
+        tolerance (float): Stop once the confidence interval half-width falls below this value (None to run all paths).
+        confidence (float): Confidence level of the interval.
+        basis (str): Regression basis for American options ('power' or 'laguerre').
+        degree (int): Highest polynomial degree of the regression basis.
+        seed (int): Seed of the per-chunk random streams (None for fresh entropy).
+        variance_reduction (str or tuple): Variance reduction techniques (see calculate_asian_option_price).
+
+        Returns:
+        tuple: Option price, its standard error and the number of paths used.
+        """
+        self._validate(option_type, average_method, basis, variance_reduction)
+        simulate = partial(self._simulate_values, option_type, average_method = average_method, basis = basis, degree = degree,
+                           variance_reduction = variance_reduction)
+        return stream_option_price(simulate, chunk_size, max_iterations, tolerance, confidence, seed)
+
+    @stage
+    def calculate_asian_option_price_parallel(self, option_type, iterations, average_method, seed = None, workers = None,
+                                              chunk_size = 100000, basis = 'power', degree = POLYDEGREE, variance_reduction = None):
+        """
+        Calculate the option price with paths split across a process pool.
+
+        Every chunk of paths draws from its own child stream of the seed, so for a given seed the price
+        is bit-identical whatever the number of workers. For American options each chunk runs its own
+        Longstaff-Schwartz regression.
+
+        Parameters:
+        option_type (str): Type of option ('EC', 'EP', 'AC', 'AP').
+        iterations (int): Total number of paths.
+        average_method (str): Method for averaging ('arithmetic' or 'geometric').
+        seed (int): Seed of the per-chunk random streams (None for fresh entropy).
+        workers (int): Number of worker processes (None for all cores).
+        chunk_size (int): Number of paths per chunk.
+        basis (str): Regression basis for American options ('power' or 'laguerre').
+        degree (int): Highest polynomial degree of the regression basis.
+        variance_reduction (str or tuple): Variance reduction techniques (see calculate_asian_option_price).
+
+        Returns:
+        tuple: Option price and its standard error.
+        """
+        self._validate(option_type, average_method, basis, variance_reduction)
+        simulate = partial(self._simulate_values, option_type, average_method = average_method, basis = basis, degree = degree,
+                           variance_reduction = variance_reduction)
+        return parallel_option_price(simulate, iterations, chunk_size, seed, workers)
+
+    @stage
+    def calculate_asian_option_price_qmc(self, option_type, iterations, average_method, replications = 16, seed = None,
+                                         basis = 'power', degree = POLYDEGREE, variance_reduction = None):
+        """
+        Calculate the option price with randomized quasi-Monte Carlo (scrambled Sobol points, Brownian bridge paths).
+
+        Parameters:
+        option_type (str): Type of option ('EC', 'EP', 'AC', 'AP').
+        iterations (int): Number of paths per replication, rounded up to a power of two.
+        average_method (str): Method for averaging ('arithmetic' or 'geometric').
+        replications (int): Number of independent scramblings used for the error estimate.
+        seed (int): Seed of the scramblings (None for fresh entropy).
+        basis (str): Regression basis for American options ('power' or 'laguerre').
+        degree (int): Highest polynomial degree of the regression basis.
+        variance_reduction (str or tuple): Variance reduction techniques (see calculate_asian_option_price).
+
+        Returns:
+        tuple: Option price and its standard error.
+        """
+        self._validate(option_type, average_method, basis, variance_reduction)
+        simulate = partial(self._simulate_values, option_type, average_method = average_method, basis = basis, degree = degree,
+                           variance_reduction = variance_reduction, sampler = 'sobol')
+        return rqmc_option_price(simulate, iterations, replications, seed)
+
+    def _validate(self, option_type, average_method, basis, variance_reduction):
+        """Check the arguments shared by the calculate_* entry points."""
+
         if option_type not in ('EC', 'EP', 'AC', 'AP'):
             raise ValueError("Invalid option type")
 
         if average_method not in ('arithmetic', 'geometric'):
             raise ValueError("Invalid average method")
 
-        stock_prices_ave = self._generate_random_paths(iterations, average_method)
+        if basis not in BASES:
+            raise ValueError("Invalid regression basis")
 
-        if option_type in ('AC', 'AP'):
-            return self._backward_induction(stock_prices_ave, is_call=(option_type == 'AC'), iterations = iterations)
-        else:
-            res = np.mean([max(price - self.strike, 0) if option_type == 'EC' else max(self.strike - price, 0) for price in np.array(stock_prices_ave)[-1]])
-            return res * np.exp(-self.interest_rate * self.period)
+        variance_reduction_modes(variance_reduction)
 
-    def _generate_random_paths(self, iterations, average_method):
+    @stage
+    def _simulate_values(self, option_type, iterations, rng = None, average_method = 'arithmetic', basis = 'power', degree = POLYDEGREE,
+                         variance_reduction = None, sampler = 'pseudo'):
+        """Simulate the given number of paths and return the discounted value of each (or of each antithetic pair)."""
 
-        randomwalk = np.random.normal(0, 1, size = iterations)
-        stock_prices = [self.current_stock * np.ones(iterations)]
-        ave_prices = copy.deepcopy(stock_prices)
+        modes = variance_reduction_modes(variance_reduction)
+        randomwalk = standard_normals(self.rng if rng is None else rng, (self.N, iterations), modes, sampler)
+        stock_prices_ave = self._generate_random_paths(randomwalk, average_method)
+        maturity_discount = np.exp(-self.interest_rate * self.period)
+        is_call = option_type in ('EC', 'AC')
 
-        for i in range(self.N):
-            randomwalk = np.random.normal(0, 1, size = iterations)
-            X = ave_prices[-1]
-            Y = list(stock_prices[-1] * np.exp(self.mu * self.deltaT + self.sigma * self.deltaT ** 0.5 * randomwalk))
+        if option_type in ('AC', 'AP'):
+            values = self._backward_induction(stock_prices_ave, is_call = is_call, basis = basis, degree = degree)
+        else:
+            values = np.maximum(stock_prices_ave[-1] - self.strike, 0) if is_call else np.maximum(self.strike - stock_prices_ave[-1], 0)
+            values = values * maturity_discount
+
+        control = control_mean = None
+        if 'control_variate' in modes:
+            # Log-price increments, and the weights of each increment in the sum of log-prices over all dates
+            increments = self.sigma * self.deltaT ** 0.5 * randomwalk + self.mu * self.deltaT
             if average_method == 'arithmetic':
-                Z = [(X[j] * (i + 1) + Y[j]) / (i + 2) for j in range(len(X))]
+                weights = np.arange(self.N, 0, -1) / (self.N + 1.)
+                geometric_average = self.current_stock * np.exp(weights @ increments)
+                control = np.maximum(geometric_average - self.strike, 0) if is_call else np.maximum(self.strike - geometric_average, 0)
+                control = control * maturity_discount
+                control_mean = discrete_geometric_asian('AEC-G' if is_call else 'AEP-G', self.current_stock, self.strike,
+                                                        self.period, self.sigma, self.interest_rate, self.N)
             else:
-                Z = [np.exp((np.log(X[j]) * (i + 1) + np.log(Y[j])) / (i + 2)) for j in range(len(X))]
-            stock_prices.append(Y)
-            ave_prices.append(Z)
-        return ave_prices
+                control = self.current_stock * np.exp(increments.sum(axis = 0)) * maturity_discount
+                control_mean = self.current_stock
 
-    def _backward_induction(self, stock_prices_ave, is_call, iterations):
+        return reduce_variance(values, modes, control, control_mean)
 
-        stock_prices_ave = np.array(stock_prices_ave)
-        payoff = np.array([[max(stock_prices_ave[i][j] - self.strike, 0) if is_call else max(self.strike - stock_prices_ave[i][j], 0)
-                            for j in range(iterations)] for i in range(self.N + 1)])
-        Y = payoff[self.N]
+    @stage
+    def _generate_random_paths(self, randomwalk, average_method):
+        """
+        Generate running averages of stock price paths for all iterations at once.
+
+        Parameters:
+        randomwalk (np.ndarray): Standard normals of shape (N, iterations).
+        average_method (str): Method for averaging ('arithmetic' or 'geometric').
 
-        for i in range(self.N - 1, 0, -1):
-            X = stock_prices_ave[i]
-            hold = np.where(payoff[i] > 0)
-            Y *= self.discount_factor
+        Returns:
+        np.ndarray: Running averages of shape (N + 1, iterations); row i holds the average of the
+                    first i + 1 prices of each path (arithmetic or geometric).
+        """
+        ave_prices = np.empty((self.N + 1, randomwalk.shape[1]))
+        ave_prices[0] = np.log(self.current_stock)
+
+        # Log-prices: cumulative sum of the increments on top of log(S0)
+        np.multiply(randomwalk, self.sigma * self.deltaT ** 0.5, out = ave_prices[1:])
+        ave_prices[1:] += self.mu * self.deltaT
+        np.cumsum(ave_prices, axis = 0, out = ave_prices)
+
+        counts = np.arange(1, self.N + 2)[:, None]
+        if average_method == 'arithmetic':
+            np.exp(ave_prices, out = ave_prices)
+            np.cumsum(ave_prices, axis = 0, out = ave_prices)
+            ave_prices /= counts
+        else:
+            np.cumsum(ave_prices, axis = 0, out = ave_prices)
+            ave_prices /= counts
+            np.exp(ave_prices, out = ave_prices)
+        return ave_prices
 
-            if len(hold[0]) > POLYDEGREE:
-                # Apply Least square method
-                regression = np.polyfit(X[hold], Y[hold], POLYDEGREE)
-                CY = np.polyval(regression, X[hold])
+    @stage
+    def _backward_induction(self, stock_prices_ave, is_call, basis = 'power', degree = POLYDEGREE):
 
-                # Whether to exercise now
-                Y[hold] = np.where(payoff[i][hold] > CY, payoff[i][hold], Y[hold])
-        return np.mean(Y)
+        payoff = np.maximum(stock_prices_ave - self.strike, 0.) if is_call else np.maximum(self.strike - stock_prices_ave, 0.)
+        return least_squares_induction(stock_prices_ave, payoff, self.discount_factor, basis, degree, self.strike)
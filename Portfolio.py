@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+import csv
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from time import perf_counter
+import numpy as np
+from BlackScholes import black_scholes_batch
+from BinomialTree import BatchOptionPricer
+
+ENGINES = ('BlackScholes', 'BinomialTree', 'FiniteDiff', 'MonteCarlo')
+OPTION_TYPES = {'BlackScholes': ('EC', 'EP', 'AEC-A', 'AEP-A', 'AEC-G', 'AEP-G'),
+                'BinomialTree': ('EC', 'EP', 'AC', 'AP'),
+                'FiniteDiff': ('EC', 'EP', 'AC', 'AP'),
+                'MonteCarlo': ('EC', 'EP', 'AC', 'AP')}
+FLOAT_COLUMNS = ('stock', 'strike', 'volatility', 'interest_rate', 'period')
+POSITIVE_COLUMNS = ('stock', 'strike', 'volatility', 'period')
+ENGINE_PARAMETERS = {'steps': ('BinomialTree', 'FiniteDiff', 'MonteCarlo'), 'paths': ('MonteCarlo',), 'grid': ('FiniteDiff',)}
+DEFAULT_STEPS = 100      # Tree steps, finite difference time steps or Monte Carlo time steps
+DEFAULT_PATHS = 100000   # Monte Carlo paths
+DEFAULT_GRID = 200       # Finite difference stock steps
+MIN_GRID = 3             # Fewest finite difference stock steps (two interior nodes)
+FD_MAX_STOCK_FACTOR = 4. # Finite difference grid bound as a multiple of max(stock, strike)
+
+def _read_csv_chunks(input_file, chunk_size):
+    """Yield the rows of a CSV file in chunks, as dicts of column lists."""
+
+    with open(input_file, newline='') as csvfile:
+        reader = csv.DictReader(csvfile)
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                return
+            yield {name: [row[name] for row in rows] for name in reader.fieldnames}
+
+def _import_pyarrow():
+    """Import the optional pyarrow dependency, needed for Parquet files only."""
+
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError("Parquet files require pyarrow") from error
+    return pyarrow
+
+def _read_parquet_chunks(input_file, chunk_size):
+    """Yield the rows of a Parquet file in record batches, as dicts of column lists."""
+
+    pa = _import_pyarrow()
+    for batch in pa.parquet.ParquetFile(input_file).iter_batches(batch_size = chunk_size):
+        yield batch.to_pydict()
+
+def _to_float(value):
+    """Parse one raw cell as a float, NaN when it is not a number."""
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _column(raw, name, default, dtype):
+    """Convert a raw column to an array, filling missing columns and empty cells with a default."""
+
+    values = raw.get(name)
+    if values is None:
+        return np.full(len(next(iter(raw.values()))), default, dtype = dtype)
+    if dtype is float:
+        return np.array([default if value in ('', None) else _to_float(value) for value in values], dtype = float)
+    return np.array([default if value in ('', None) else value for value in values], dtype = dtype)
+
+def contract_errors(chunk):
+    """
+    Validate every row of a chunk of contracts.
+
+    A row is valid when its engine is known, its option type is priced by that engine, its contract values
+    are finite (stock, strike, volatility and period positive) and the engine parameters it uses are whole
+    numbers of at least 1 (MIN_GRID for grid).
+
+    Parameters:
+    chunk (dict): Column name to np.ndarray with the engine, option_type, FLOAT_COLUMNS, steps, paths and grid
+                  columns; the engine parameters may be floats.
+
+    Returns:
+    np.ndarray: Error message per row, '' for valid rows.
+    """
+    engine, option_type = chunk['engine'], chunk['option_type']
+    known_type = np.zeros(len(engine), dtype = bool)
+    for name, option_types in OPTION_TYPES.items():
+        known_type |= (engine == name) & np.isin(option_type, option_types)
+
+    values = np.stack([chunk[name] for name in FLOAT_COLUMNS])
+    positive = np.stack([chunk[name] > 0 for name in POSITIVE_COLUMNS]).all(axis = 0)
+
+    parameters_valid = np.ones(len(engine), dtype = bool)
+    for name, engines in ENGINE_PARAMETERS.items():
+        parameter = np.asarray(chunk[name], dtype = float)
+        with np.errstate(invalid = 'ignore'):
+            valid = (parameter >= (MIN_GRID if name == 'grid' else 1)) & (parameter == np.floor(parameter))
+        parameters_valid &= valid | ~np.isin(engine, engines)
+
+    return np.select([~np.isin(engine, ENGINES), ~known_type, ~np.isfinite(values).all(axis = 0), ~positive, ~parameters_valid],
+                     ["Invalid engine", "Invalid option type", "Missing or invalid contract parameters",
+                      "Stock, strike, volatility and period must be positive", "Invalid engine parameters"], '')
+
+def _prepare_chunk(raw, first_row):
+    """
+    Convert a chunk of raw portfolio rows to typed arrays and validate it.
+
+    Parameters:
+    raw (dict): Column name to list of values, as read from the file.
+    first_row (int): Index of the chunk's first row in the file (seeds the Monte Carlo rows).
+
+    Returns:
+    tuple: (valid rows as a dict of column name to np.ndarray, plus 'row' with the row indices in the file;
+            error message per row of the chunk, '' for valid rows).
+    """
+    chunk = {name: _column(raw, name, np.nan, float) for name in FLOAT_COLUMNS}
+    chunk['option_type'] = _column(raw, 'option_type', '', str)
+    chunk['engine'] = _column(raw, 'engine', 'BlackScholes', str)
+    chunk['steps'] = _column(raw, 'steps', DEFAULT_STEPS, float)
+    chunk['paths'] = _column(raw, 'paths', DEFAULT_PATHS, float)
+    chunk['grid'] = _column(raw, 'grid', DEFAULT_GRID, float)
+    chunk['row'] = first_row + np.arange(len(chunk['engine']))
+
+    errors = contract_errors(chunk)
+    valid = errors == ''
+    chunk = {name: column[valid] for name, column in chunk.items()}
+    for name in ENGINE_PARAMETERS:
+        # Parameters an engine does not use may be out of range; they are never read
+        chunk[name] = np.where(np.isfinite(chunk[name]), chunk[name], 0).astype(int)
+    return chunk, errors
+
+def price_chunk(chunk):
+    """
+    Price one chunk of a portfolio, routing each engine's rows to its fastest path.
+
+    Black-Scholes rows are priced in one broadcast call and binomial rows in one BatchOptionPricer sweep per
+    step count. Finite difference rows (Crank-Nicolson with Rannacher start-up on a strike-concentrated grid)
+    and Monte Carlo rows are priced one by one; rows sharing their structural inputs reuse the cached
+    finite difference factorization.
+
+    Parameters:
+    chunk (dict): Typed and validated columns, as returned by _prepare_chunk.
+
+    Returns:
+    tuple: (prices, seconds spent pricing the chunk).
+    """
+    start_time = perf_counter()
+    engine, option_type, steps = chunk['engine'], chunk['option_type'], chunk['steps']
+    stock, strike, volatility, interest_rate, period = (chunk[name] for name in
+        ('stock', 'strike', 'volatility', 'interest_rate', 'period'))
+    prices = np.full(len(engine), np.nan)
+
+    mask = engine == 'BlackScholes'
+    if mask.any():
+        prices[mask] = black_scholes_batch(option_type[mask], stock[mask], strike[mask], period[mask],
+                                           volatility[mask], interest_rate[mask])
+
+    for N in np.unique(steps[engine == 'BinomialTree']):
+        mask = (engine == 'BinomialTree') & (steps == N)
+        prices[mask] = BatchOptionPricer(stock[mask], strike[mask], int(N), period[mask], volatility[mask],
+                                         interest_rate[mask]).calculate_option_price(option_type[mask])
+
+    # The finite difference and Monte Carlo engines are imported only when a chunk uses them
+    for i in np.flatnonzero(engine == 'FiniteDiff'):
+        from FiniteDiff import OptionPricer as FDPricer
+        pricer = FDPricer(stock[i], strike[i], int(steps[i]), period[i], volatility[i], interest_rate[i])
+        prices[i] = pricer.calculate_option_price(option_type[i], FD_MAX_STOCK_FACTOR * max(stock[i], strike[i]),
+                                                  int(chunk['grid'][i]), 'crank-nicolson', 2, grid_type = 'sinh')
+
+    for i in np.flatnonzero(engine == 'MonteCarlo'):
+        from MonteCarlo import OptionPricer as MCPricer
+        pricer = MCPricer(stock[i], strike[i], int(steps[i]), period[i], volatility[i], interest_rate[i], seed = int(chunk['row'][i]))
+        prices[i] = pricer.calculate_option_price(option_type[i], int(chunk['paths'][i]))
+
+    return prices, perf_counter() - start_time
+
+class _ResultWriter:
+    """Incremental writer of priced chunks to a CSV or Parquet file."""
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.parquet = output_file.endswith('.parquet')
+        self._file = self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def write(self, raw, prices, errors):
+        """Append a chunk: its input columns followed by the price and error columns."""
+
+        columns = dict(raw, price = prices.tolist(), error = errors.tolist())
+        if self.parquet:
+            pa = _import_pyarrow()
+            table = pa.Table.from_pydict(columns)
+            if self._writer is None:
+                self._writer = pa.parquet.ParquetWriter(self.output_file, table.schema)
+            self._writer.write_table(table)
+        else:
+            if self._writer is None:
+                self._file = open(self.output_file, 'w', newline='')
+                self._writer = csv.writer(self._file)
+                self._writer.writerow(columns)
+            self._writer.writerows(zip(*columns.values()))
+
+    def __exit__(self, *exc_info):
+        if self.parquet and self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+def price_portfolio(input_file, output_file, chunk_size = 10000, workers = None):
+    """
+    Price a portfolio file end to end and write the prices incrementally.
+
+    The input is a CSV or Parquet file (by extension) with one contract per row and the columns option_type,
+    stock, strike, volatility, interest_rate and period, plus the optional engine ('BlackScholes' by default,
+    'BinomialTree', 'FiniteDiff' or 'MonteCarlo') and engine parameters steps, paths and grid. Chunks are priced
+    by a process pool; at most two chunks per worker are in flight, so memory stays bounded whatever the file
+    size. Results are written in input order, with the input columns followed by a price column and an error
+    column. Invalid rows (see contract_errors) are not priced: their price is NaN and the error column says why.
+
+    Parameters:
+    input_file (str): Portfolio file (.csv or .parquet).
+    output_file (str): Result file (.csv or .parquet).
+    chunk_size (int): Rows per chunk.
+    workers (int): Number of worker processes (default: number of CPUs).
+
+    Returns:
+    dict: Throughput and latency statistics: rows, invalid_rows, chunks, seconds, rows_per_second, and the
+          median, 99th percentile and maximum chunk latencies in seconds (pricing time and submit-to-write time).
+    """
+    read_chunks = _read_parquet_chunks if input_file.endswith('.parquet') else _read_csv_chunks
+    start_time = perf_counter()
+    rows, invalid_rows, pricing_times, latencies = 0, 0, [], []
+
+    workers = workers or os.cpu_count()
+    window = 2 * workers
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers = workers) as executor, _ResultWriter(output_file) as writer:
+
+        def write_oldest():
+            raw, errors, submitted, future = pending.popleft()
+            valid_prices, pricing_time = future.result()
+            prices = np.full(len(errors), np.nan)
+            prices[errors == ''] = valid_prices
+            writer.write(raw, prices, errors)
+            pricing_times.append(pricing_time)
+            latencies.append(perf_counter() - submitted)
+
+        for raw in read_chunks(input_file, chunk_size):
+            chunk, errors = _prepare_chunk(raw, rows)
+            rows += len(errors)
+            invalid_rows += np.count_nonzero(errors != '')
+            pending.append((raw, errors, perf_counter(), executor.submit(price_chunk, chunk)))
+            if len(pending) >= window:
+                write_oldest()
+
+        while pending:
+            write_oldest()
+
+    seconds = perf_counter() - start_time
+    stats = {'rows': rows, 'invalid_rows': invalid_rows, 'chunks': len(latencies), 'seconds': seconds, 'rows_per_second': rows / seconds}
+    for name, times in (('pricing', pricing_times), ('latency', latencies)):
+        times = np.array(times) if times else np.zeros(1)
+        stats[f'{name}_p50'], stats[f'{name}_p99'] = np.percentile(times, [50, 99])
+        stats[f'{name}_max'] = times.max()
+    return stats
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import math
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+import numpy as np
+from Portfolio import ENGINES, FLOAT_COLUMNS, DEFAULT_STEPS, DEFAULT_PATHS, DEFAULT_GRID, contract_errors, price_chunk
+
+KEY_FIELDS = ('engine', 'option_type') + FLOAT_COLUMNS + ('steps', 'paths', 'grid')
+LATENCY_WINDOW = 10000  # Number of recent requests kept for the latency percentiles
+
+def contract_key(request):
+    """
+    Validate a pricing request and return its normalized contract parameters.
+
+    Parameters:
+    request (dict): Contract fields (see KEY_FIELDS); engine and the engine parameters are optional.
+
+    Returns:
+    tuple: Values of KEY_FIELDS, with defaults filled in.
+    """
+    try:
+        contract = tuple(float(request[name]) for name in FLOAT_COLUMNS)
+        parameters = tuple(float(request.get(name, default)) for name, default in
+                           (('steps', DEFAULT_STEPS), ('paths', DEFAULT_PATHS), ('grid', DEFAULT_GRID)))
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError("Invalid contract parameters") from error
+
+    key = (request.get('engine', 'BlackScholes'), request.get('option_type')) + contract + parameters
+    error = contract_errors({name: np.array([value]) for name, value in zip(KEY_FIELDS, key)})[0]
+    if error:
+        raise ValueError(error)
+
+    return key[:-3] + tuple(int(value) for value in parameters)
+
+class PricingServer:
+    """Asyncio pricing server that coalesces concurrent requests into micro-batches per engine."""
+
+    def __init__(self, host = '127.0.0.1', port = 8765, max_batch = 4096, max_delay = 0.002, cache_ttl = 1., workers = None):
+        """
+        Initialize the PricingServer object with parameters.
+
+        Parameters:
+        host (str): Interface to listen on.
+        port (int): TCP port to listen on.
+        max_batch (int): Largest micro-batch; a full batch is priced without waiting for max_delay.
+        max_delay (float): Seconds a request may wait for other requests to join its batch.
+        cache_ttl (float): Seconds a price stays in the result cache.
+        workers (int): Number of worker processes (default: number of CPUs).
+        """
+
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.cache_ttl = cache_ttl
+        self.workers = workers
+        self._pending = {engine: [] for engine in ENGINES}
+        self._timers = {}
+        self._in_flight = {}
+        self._cache = {}
+        self._latencies = deque(maxlen = LATENCY_WINDOW)
+        self._counters = {'requests': 0, 'errors': 0, 'cache_hits': 0, 'coalesced': 0, 'batches': 0, 'batched_contracts': 0}
+
+    async def serve_forever(self):
+        """Start the worker pool and serve connections until cancelled."""
+
+        self._loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers = self.workers) as self._executor:
+            server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+            async with server:
+                await server.serve_forever()
+
+    async def price(self, request):
+        """
+        Price one contract, from the cache, by joining an identical request in flight, or in the next batch.
+
+        Parameters:
+        request (dict): Contract fields (see contract_key).
+
+        Returns:
+        float: Option price.
+        """
+        key = contract_key(request)
+        now = self._loop.time()
+
+        cached = self._cache.get(key)
+        if cached is not None and cached[1] > now:
+            self._counters['cache_hits'] += 1
+            return cached[0]
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self._counters['coalesced'] += 1
+            return await asyncio.shield(future)
+
+        future = self._in_flight[key] = self._loop.create_future()
+        engine = key[0]
+        self._pending[engine].append(key)
+        if len(self._pending[engine]) >= self.max_batch:
+            self._flush(engine)
+        elif engine not in self._timers:
+            self._timers[engine] = self._loop.call_later(self.max_delay, self._flush, engine)
+        return await asyncio.shield(future)
+
+    def metrics(self):
+        """
+        Return the service counters and the latency percentiles of the recent requests.
+
+        Returns:
+        dict: Counters plus 'latency_p50', 'latency_p99' and 'latency_max' in seconds and 'cache_size'.
+        """
+        latencies = np.array(self._latencies) if self._latencies else np.zeros(1)
+        p50, p99 = np.percentile(latencies, [50, 99])
+        return dict(self._counters, latency_p50 = p50, latency_p99 = p99, latency_max = latencies.max(),
+                    cache_size = len(self._cache))
+
+    def _flush(self, engine):
+        """Send the pending requests of an engine to the worker pool as one batch."""
+
+        timer = self._timers.pop(engine, None)
+        if timer is not None:
+            timer.cancel()
+        keys, self._pending[engine] = self._pending[engine], []
+        if keys:
+            self._counters['batches'] += 1
+            self._counters['batched_contracts'] += len(keys)
+            self._loop.create_task(self._price_batch(keys))
+
+    async def _price_batch(self, keys):
+        """
+        Price a batch on the worker pool and resolve the waiting requests.
+
+        A batch that fails is split in halves and each half is priced again, so only the contracts that
+        cannot be priced get the error. Non-finite prices are reported as errors and never cached.
+        """
+        chunk = {name: np.array(values) for name, values in zip(KEY_FIELDS, zip(*keys))}
+        chunk['row'] = np.arange(len(keys))
+        try:
+            prices, _ = await self._loop.run_in_executor(self._executor, price_chunk, chunk)
+        except Exception as error:
+            if len(keys) == 1:
+                self._in_flight.pop(keys[0]).set_exception(error)
+            else:
+                middle = len(keys) // 2
+                await asyncio.gather(self._price_batch(keys[:middle]), self._price_batch(keys[middle:]))
+            return
+
+        expiry = self._loop.time() + self.cache_ttl
+        self._evict_expired()
+        for key, price in zip(keys, prices.tolist()):
+            future = self._in_flight.pop(key)
+            if not math.isfinite(price):
+                future.set_exception(ValueError("Pricing failed: non-finite price"))
+                continue
+            # Re-insert at the end so the cache stays in expiry order
+            self._cache.pop(key, None)
+            self._cache[key] = (price, expiry)
+            future.set_result(price)
+
+    def _evict_expired(self):
+        """Drop expired cache entries (entries are inserted in expiry order)."""
+
+        now = self._loop.time()
+        while self._cache:
+            key = next(iter(self._cache))
+            if self._cache[key][1] > now:
+                break
+            del self._cache[key]
+
+    async def _handle_connection(self, reader, writer):
+        """Serve one connection: one JSON request per line, answered out of order by id."""
+
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = self._loop.create_task(self._answer(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def _answer(self, line, writer):
+        """Parse and answer a 'price' or 'metrics' message; malformed lines get an error response with a null id."""
+
+        start_time = self._loop.time()
+        response = {'id': None}
+        try:
+            try:
+                message = json.loads(line)
+            except ValueError as error:
+                raise ValueError("Invalid request: malformed JSON") from error
+            if not isinstance(message, dict):
+                raise ValueError("Invalid request: expected a JSON object")
+
+            response['id'] = message.get('id')
+            if message.get('method') == 'metrics':
+                response['result'] = self.metrics()
+            else:
+                self._counters['requests'] += 1
+                response['result'] = await self.price(message.get('params', {}))
+                self._latencies.append(self._loop.time() - start_time)
+        except Exception as error:
+            self._counters['errors'] += 1
+            response['error'] = str(error)
+        writer.write(json.dumps(response).encode() + b'\n')
+        await writer.drain()
+
+class PricingClient:
+    """Asyncio client of a PricingServer; concurrent calls share one connection."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._ids = count()
+        self._waiting = {}
+        self._receiver = asyncio.get_running_loop().create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host = '127.0.0.1', port = 8765):
+        """Open a connection to a PricingServer."""
+
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def price(self, option_type, stock, strike, volatility, interest_rate, period, engine = 'BlackScholes', **engine_params):
+        """
+        Price one contract on the server.
+
+        Parameters:
+        option_type (str): Type of option, as accepted by the engine.
+        stock (float): Current stock price.
+        strike (float): Strike price.
+        volatility (float): Volatility of the stock.
+        interest_rate (float): Risk-free interest rate.
+        period (float): Period to maturity.
+        engine (str): 'BlackScholes', 'BinomialTree', 'FiniteDiff' or 'MonteCarlo'.
+        engine_params: Optional steps, paths and grid.
+
+        Returns:
+        float: Option price.
+        """
+        params = dict(engine_params, option_type = option_type, stock = stock, strike = strike, volatility = volatility,
+                      interest_rate = interest_rate, period = period, engine = engine)
+        return await self._call('price', params)
+
+    async def metrics(self):
+        """Return the server metrics (see PricingServer.metrics)."""
+        return await self._call('metrics', {})
+
+    async def close(self):
+        """Close the connection."""
+
+        self._receiver.cancel()
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def _call(self, method, params):
+        """Send one request and wait for the response with the same id."""
+
+        request_id = next(self._ids)
+        future = self._waiting[request_id] = asyncio.get_running_loop().create_future()
+        self._writer.write(json.dumps({'id': request_id, 'method': method, 'params': params}).encode() + b'\n')
+        await self._writer.drain()
+        return await future
+
+    async def _receive(self):
+        """Dispatch the responses to the waiting calls."""
+
+        while line := await self._reader.readline():
+            response = json.loads(line)
+            future = self._waiting.pop(response['id'], None)
+            if future is None:
+                # Errors about lines the server could not parse carry no id
+                continue
+            if 'error' in response:
+                future.set_exception(ValueError(response['error']))
+            else:
+                future.set_result(response['result'])
+
+        for future in self._waiting.values():
+            future.set_exception(ConnectionError("Connection closed by the server"))
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Serve option prices over TCP, one JSON request per line.')
+    parser.add_argument('--host', default = '127.0.0.1', help = 'interface to listen on (default: 127.0.0.1)')
+    parser.add_argument('-p', '--port', type = int, default = 8765, help = 'TCP port (default: 8765)')
+    parser.add_argument('-b', '--max-batch', type = int, default = 4096, help = 'largest micro-batch (default: 4096)')
+    parser.add_argument('-d', '--max-delay', type = float, default = 0.002, help = 'batching delay in seconds (default: 0.002)')
+    parser.add_argument('-t', '--cache-ttl', type = float, default = 1., help = 'result cache TTL in seconds (default: 1)')
+    parser.add_argument('-w', '--workers', type = int, default = None, help = 'worker processes (default: number of CPUs)')
+    args = parser.parse_args()
+
+    server = PricingServer(args.host, args.port, args.max_batch, args.max_delay, args.cache_ttl, args.workers)
+    asyncio.run(server.serve_forever())
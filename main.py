@@ -1,13 +1,8 @@
 #!/usr/bin/env python3
 import argparse
-import numpy as np
-import os
-from BinomialTree import OptionPricer as BinPricer
-from BinomialTree_Asian import AsianOptionPricer as AsianBinPricer
-from MonteCarlo import OptionPricer as MCPricer
-from MonteCarlo_Asian import AsianOptionPricer as AsianMCPricer
-from FiniteDiff import OptionPricer as FDPricer
-from BlackScholes import *
+
+# The engines are imported only when selected, so a one-shot call pays for just the engines it runs
+ENGINES = ('binomial', 'binomial-asian', 'montecarlo', 'montecarlo-asian', 'finite-difference', 'black-scholes')
 
 ########## main function ###############
 if __name__=='__main__':
@@ -19,8 +14,24 @@ if __name__=='__main__':
     parser.add_argument('-v', '--volatility', type = float, default = 0.4, help = 'volatility (default value: 40%%)')
     parser.add_argument('-P', '--period', type = float, default = 1., help = 'period at maturity (default value: 1.)')
     parser.add_argument('-N', '--layers', type = int, default = 5, help = 'options type [default: AM (American call)]')
+    parser.add_argument('-e', '--engines', nargs = '+', choices = ENGINES, default = list(ENGINES), help = 'engines to run (default: all)')
+    parser.add_argument('-i', '--portfolio', help = 'batch mode: price a portfolio file (.csv or .parquet) instead')
+    parser.add_argument('-o', '--output', default = 'prices.csv', help = 'batch mode: result file (.csv or .parquet) (default: prices.csv)')
+    parser.add_argument('-c', '--chunk-size', type = int, default = 10000, help = 'batch mode: rows per chunk (default: 10000)')
+    parser.add_argument('-w', '--workers', type = int, default = None, help = 'batch mode: worker processes (default: number of CPUs)')
     args = parser.parse_args()
 
+    if args.portfolio:
+        from Portfolio import price_portfolio
+        stats = price_portfolio(args.portfolio, args.output, args.chunk_size, args.workers)
+        print(f"Priced {stats['rows']} rows in {stats['chunks']} chunks in {stats['seconds']:.2f} s "
+              f"({stats['rows_per_second']:.0f} rows/s)")
+        if stats['invalid_rows']:
+            print(f"{stats['invalid_rows']} invalid rows were not priced (see the error column of {args.output})")
+        print(f"Chunk pricing time p50 {stats['pricing_p50']:.4f} s, p99 {stats['pricing_p99']:.4f} s, max {stats['pricing_max']:.4f} s")
+        print(f"Chunk latency p50 {stats['latency_p50']:.4f} s, p99 {stats['latency_p99']:.4f} s, max {stats['latency_max']:.4f} s")
+        raise SystemExit
+
     curr_stock = args.stock
     strike = args.strike
     interest_rate = args.interest
@@ -28,41 +39,53 @@ if __name__=='__main__':
     period = args.period
     N = args.layers
 
-    t = BinPricer(curr_stock, strike, N, period, volatility, interest_rate)
-    print('Binomial EP', t.calculate_option_price('EP'))
-    print('Binomial EC', t.calculate_option_price('EC'))
-    print('Binomial AP', t.calculate_option_price('AP'))
-    print('Binomial AC', t.calculate_option_price('AC'))
+    if 'binomial' in args.engines:
+        from BinomialTree import OptionPricer as BinPricer
+        t = BinPricer(curr_stock, strike, N, period, volatility, interest_rate)
+        print('Binomial EP', t.calculate_option_price('EP'))
+        print('Binomial EC', t.calculate_option_price('EC'))
+        print('Binomial AP', t.calculate_option_price('AP'))
+        print('Binomial AC', t.calculate_option_price('AC'))
 
-    t = AsianBinPricer(curr_stock, strike, N, period, volatility, interest_rate)
-    print('Binomial Asian EP arithmetic', t.calculate_asian_option_price('EP', 'arithmetic'))
-    print('Binomial Asian EP geometric', t.calculate_asian_option_price('EP', 'geometric'))
-    print('Binomial Asian EC arithmetic', t.calculate_asian_option_price('EC', 'arithmetic'))
-    print('Binomial Asian EC geometric', t.calculate_asian_option_price('EC', 'geometric'))
-    print('Binomial Asian AP arithmetic', t.calculate_asian_option_price('AP', 'arithmetic'))
-    print('Binomial Asian AC arithmetic', t.calculate_asian_option_price('AC', 'arithmetic'))
+    if 'binomial-asian' in args.engines:
+        from BinomialTree_Asian import AsianOptionPricer as AsianBinPricer
+        t = AsianBinPricer(curr_stock, strike, N, period, volatility, interest_rate)
+        print('Binomial Asian EP arithmetic', t.calculate_asian_option_price('EP', 'arithmetic'))
+        print('Binomial Asian EP geometric', t.calculate_asian_option_price('EP', 'geometric'))
+        print('Binomial Asian EC arithmetic', t.calculate_asian_option_price('EC', 'arithmetic'))
+        print('Binomial Asian EC geometric', t.calculate_asian_option_price('EC', 'geometric'))
+        print('Binomial Asian AP arithmetic', t.calculate_asian_option_price('AP', 'arithmetic'))
+        print('Binomial Asian AC arithmetic', t.calculate_asian_option_price('AC', 'arithmetic'))
 
-    t = MCPricer(curr_stock, strike, N, period, volatility, interest_rate)
-    print('MonteCarlo EP', t.calculate_option_price('EP', 1000000))
-    print('MonteCarlo EC', t.calculate_option_price('EC', 1000000))
-    print('MonteCarlo AP', t.calculate_option_price('AP', 100000))
-    print('MonteCarlo AC', t.calculate_option_price('AC', 100000))
+    if 'montecarlo' in args.engines:
+        from MonteCarlo import OptionPricer as MCPricer
+        t = MCPricer(curr_stock, strike, N, period, volatility, interest_rate)
+        print('MonteCarlo EP', t.calculate_option_price('EP', 1000000))
+        print('MonteCarlo EC', t.calculate_option_price('EC', 1000000))
+        print('MonteCarlo AP', t.calculate_option_price('AP', 100000))
+        print('MonteCarlo AC', t.calculate_option_price('AC', 100000))
 
-    t = AsianMCPricer(curr_stock, strike, N, period, volatility, interest_rate)
-    print('MonteCarlo Asian EP arithmetic', t.calculate_asian_option_price('EP', 100000, 'arithmetic'))
-    print('MonteCarlo Asian EP geometric', t.calculate_asian_option_price('EP', 100000, 'geometric'))
-    print('MonteCarlo Asian EC arithmetic', t.calculate_asian_option_price('EC', 100000, 'arithmetic'))
-    print('MonteCarlo Asian EC geometric', t.calculate_asian_option_price('EC', 100000, 'geometric'))
-    print('MonteCarlo Asian AP arithmetic', t.calculate_asian_option_price('AP', 100000, 'arithmetic'))
-    print('MonteCarlo Asian AC arithmetic', t.calculate_asian_option_price('AC', 100000, 'arithmetic'))
+    if 'montecarlo-asian' in args.engines:
+        from MonteCarlo_Asian import AsianOptionPricer as AsianMCPricer
+        t = AsianMCPricer(curr_stock, strike, N, period, volatility, interest_rate)
+        print('MonteCarlo Asian EP arithmetic', t.calculate_asian_option_price('EP', 100000, 'arithmetic'))
+        print('MonteCarlo Asian EP geometric', t.calculate_asian_option_price('EP', 100000, 'geometric'))
+        print('MonteCarlo Asian EC arithmetic', t.calculate_asian_option_price('EC', 100000, 'arithmetic'))
+        print('MonteCarlo Asian EC geometric', t.calculate_asian_option_price('EC', 100000, 'geometric'))
+        print('MonteCarlo Asian AP arithmetic', t.calculate_asian_option_price('AP', 100000, 'arithmetic'))
+        print('MonteCarlo Asian AC arithmetic', t.calculate_asian_option_price('AC', 100000, 'arithmetic'))
 
-    t = FDPricer(curr_stock, strike, N, period, volatility, interest_rate)
-    print('Finite Difference EP', t.calculate_option_price('EP', 100, 100, 'implicit'))
-    print('Finite Difference EC', t.calculate_option_price('EC', 200, 100, 'implicit'))
-    print('Finite Difference AP', t.calculate_option_price('AP', 100, 100, 'implicit'))
-    print('Finite Difference AC', t.calculate_option_price('AC', 200, 100, 'implicit'))
+    if 'finite-difference' in args.engines:
+        from FiniteDiff import OptionPricer as FDPricer
+        t = FDPricer(curr_stock, strike, N, period, volatility, interest_rate)
+        print('Finite Difference EP', t.calculate_option_price('EP', 100, 100, 'implicit'))
+        print('Finite Difference EC', t.calculate_option_price('EC', 200, 100, 'implicit'))
+        print('Finite Difference AP', t.calculate_option_price('AP', 100, 100, 'implicit'))
+        print('Finite Difference AC', t.calculate_option_price('AC', 200, 100, 'implicit'))
 
-    print('Black-Scholes EP', black_scholes('EP', curr_stock, strike, period, volatility, interest_rate))
-    print('Black-Scholes EC', black_scholes('EC', curr_stock, strike, period, volatility, interest_rate))
-    print('Black-Scholes Asian EP geometric', black_scholes('AEP-G', curr_stock, strike, period, volatility, interest_rate))
-    print('Black-Scholes Asian EC geometric', black_scholes('AEC-G', curr_stock, strike, period, volatility, interest_rate))
+    if 'black-scholes' in args.engines:
+        from BlackScholes import black_scholes
+        print('Black-Scholes EP', black_scholes('EP', curr_stock, strike, period, volatility, interest_rate))
+        print('Black-Scholes EC', black_scholes('EC', curr_stock, strike, period, volatility, interest_rate))
+        print('Black-Scholes Asian EP geometric', black_scholes('AEP-G', curr_stock, strike, period, volatility, interest_rate))
+        print('Black-Scholes Asian EC geometric', black_scholes('AEC-G', curr_stock, strike, period, volatility, interest_rate))
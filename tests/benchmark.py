@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+import os
+import sys
+import csv
+import argparse
+import statistics
+from time import perf_counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from BlackScholes import black_scholes, black_scholes_batch, discrete_geometric_asian
+from BinomialTree import OptionPricer as BTPricer
+from BinomialTree_Asian import AsianOptionPricer as AsianBTPricer
+from MonteCarlo import OptionPricer as MCPricer
+from MonteCarlo_Asian import AsianOptionPricer as AsianMCPricer
+from FiniteDiff import OptionPricer as FDPricer, cache_clear as fd_cache_clear
+
+# Constants and configurations
+OUTPUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'outputs', 'benchmark.csv')
+STOCK_PRICE = 50
+STRIKE_PRICE = 50
+INTEREST_RATE = 0.1
+VOLATILITY = 0.4
+PERIOD = 0.4167
+OPTION_TYPE = 'EP'
+MC_STEPS = 10            # Time steps of the Monte Carlo paths and of the Asian averaging
+REFERENCE_PATHS = 1000000  # Paths of the seeded Monte Carlo references of the arithmetic Asian put
+FD_TIME_STEPS = 100
+FD_MAX_STOCK_PRICE = 200
+SEED = 0
+ENGINES = ('black_scholes', 'BinomialTree', 'BinomialTree_Asian', 'MonteCarlo', 'MonteCarlo_Asian', 'FiniteDiff')
+FIELDNAMES = ['engine', 'method', 'option_type', 'parameter', 'size', 'price', 'reference', 'abs_error',
+              'best_time', 'median_time', 'repeats']
+
+def time_call(func, warmups, repeats):
+    """
+    Time a pricing call with perf_counter.
+
+    Parameters:
+    func (callable): Zero-argument function returning a price.
+    warmups (int): Untimed calls made first (imports, caches, allocator).
+    repeats (int): Timed calls.
+
+    Returns:
+    tuple: (price, best time, median time) with times in seconds.
+    """
+    for _ in range(warmups):
+        func()
+
+    times = []
+    for _ in range(repeats):
+        start_time = perf_counter()
+        price = func()
+        times.append(perf_counter() - start_time)
+    return price, min(times), statistics.median(times)
+
+def black_scholes_cases(quick):
+    """Closed-form pricing of books of increasing size (the error is zero by construction)."""
+
+    reference = black_scholes(OPTION_TYPE, STOCK_PRICE, STRIKE_PRICE, PERIOD, VOLATILITY, INTEREST_RATE)
+    for size in (1, 1000) if quick else (1, 1000, 100000):
+        yield 'batch', 'contracts', size, reference, lambda size = size: black_scholes_batch(
+            OPTION_TYPE, [STOCK_PRICE] * size, STRIKE_PRICE, PERIOD, VOLATILITY, INTEREST_RATE)[0]
+
+def binomial_tree_cases(quick):
+    """European put on CRR and accelerated trees over a sweep of step counts."""
+
+    reference = black_scholes(OPTION_TYPE, STOCK_PRICE, STRIKE_PRICE, PERIOD, VOLATILITY, INTEREST_RATE)
+    for N in (25, 50, 100, 200) if quick else (25, 50, 100, 200, 400, 800, 1600):
+        yield 'crr', 'steps', N, reference, lambda N = N: BTPricer(
+            STOCK_PRICE, STRIKE_PRICE, N, PERIOD, VOLATILITY, INTEREST_RATE).calculate_option_price(OPTION_TYPE)
+        yield 'crr-smoothing-richardson', 'steps', N, reference, lambda N = N: BTPricer(
+            STOCK_PRICE, STRIKE_PRICE, N, PERIOD, VOLATILITY, INTEREST_RATE).calculate_option_price(
+            OPTION_TYPE, smoothing = True, richardson = True)
+        # Leisen-Reimer needs an odd step count
+        yield 'leisen-reimer', 'steps', N | 1, reference, lambda N = N | 1: BTPricer(
+            STOCK_PRICE, STRIKE_PRICE, N, PERIOD, VOLATILITY, INTEREST_RATE, 'leisen-reimer').calculate_option_price(OPTION_TYPE)
+
+def arithmetic_asian_reference(N, paths):
+    """Seeded Monte Carlo price of the arithmetic Asian put with N averaging steps (antithetic pairs, control variate)."""
+
+    pricer = AsianMCPricer(STOCK_PRICE, STRIKE_PRICE, N, PERIOD, VOLATILITY, INTEREST_RATE)
+    return pricer.calculate_asian_option_price_streaming(OPTION_TYPE, 'arithmetic', max_iterations = paths, seed = SEED,
+                                                         variance_reduction = ('antithetic', 'control_variate'))[0]
+
+def binomial_tree_asian_cases(quick):
+    """
+    Asian put on the path, recombining and representative-average trees.
+
+    Geometric prices are checked against the discrete-monitoring closed form and arithmetic prices against
+    a seeded Monte Carlo reference.
+    """
+
+    for N in (4, 8, 12) if quick else (4, 8, 12, 16):
+        reference = discrete_geometric_asian('AEP-G', STOCK_PRICE, STRIKE_PRICE, PERIOD, VOLATILITY, INTEREST_RATE, N)
+        yield 'path', 'steps', N, reference, lambda N = N: AsianBTPricer(
+            STOCK_PRICE, STRIKE_PRICE, N, PERIOD, VOLATILITY, INTEREST_RATE).calculate_asian_option_price(OPTION_TYPE, 'geometric')
+    for N in (10, 20, 40) if quick else (10, 20, 40, 80, 160):
+        reference = discrete_geometric_asian('AEP-G', STOCK_PRICE, STRIKE_PRICE, PERIOD, VOLATILITY, INTEREST_RATE, N)
+        yield 'recombining', 'steps', N, reference, lambda N = N: AsianBTPricer(
+            STOCK_PRICE, STRIKE_PRICE, N, PERIOD, VOLATILITY, INTEREST_RATE).calculate_asian_option_price(
+            OPTION_TYPE, 'geometric', engine = 'recombining')
+    for N in (10, 20, 50) if quick else (10, 20, 50, 100, 200):
+        references = {'geometric': discrete_geometric_asian('AEP-G', STOCK_PRICE, STRIKE_PRICE, PERIOD, VOLATILITY, INTEREST_RATE, N),
+                      'arithmetic': arithmetic_asian_reference(N, REFERENCE_PATHS // 10 if quick else REFERENCE_PATHS)}
+        for method, reference in references.items():
+            yield f'representative-{method}', 'steps', N, reference, lambda N = N, method = method: AsianBTPricer(
+                STOCK_PRICE, STRIKE_PRICE, N, PERIOD, VOLATILITY, INTEREST_RATE).calculate_asian_option_price(
+                OPTION_TYPE, method, engine = 'representative')
+
+def monte_carlo_cases(quick):
+    """European put over a sweep of path counts, plain and antithetic."""
+
+    reference = black_scholes(OPTION_TYPE, STOCK_PRICE, STRIKE_PRICE, PERIOD, VOLATILITY, INTEREST_RATE)
+    for iterations in (1000, 10000, 100000) if quick else (1000, 10000, 100000, 1000000):
+        for variance_reduction in (None, 'antithetic'):
+            yield variance_reduction or 'plain', 'paths', iterations, reference, \
+                lambda iterations = iterations, variance_reduction = variance_reduction: MCPricer(
+                    STOCK_PRICE, STRIKE_PRICE, MC_STEPS, PERIOD, VOLATILITY, INTEREST_RATE, seed = SEED).calculate_option_price(
+                    OPTION_TYPE, iterations, variance_reduction = variance_reduction)
+
+def monte_carlo_asian_cases(quick):
+    """Geometric Asian put over a sweep of path counts, plain and with a control variate."""
+
+    reference = discrete_geometric_asian('AEP-G', STOCK_PRICE, STRIKE_PRICE, PERIOD, VOLATILITY, INTEREST_RATE, MC_STEPS)
+    for iterations in (1000, 10000, 100000) if quick else (1000, 10000, 100000, 1000000):
+        for variance_reduction in (None, 'control_variate'):
+            yield variance_reduction or 'plain', 'paths', iterations, reference, \
+                lambda iterations = iterations, variance_reduction = variance_reduction: AsianMCPricer(
+                    STOCK_PRICE, STRIKE_PRICE, MC_STEPS, PERIOD, VOLATILITY, INTEREST_RATE, seed = SEED).calculate_asian_option_price(
+                    OPTION_TYPE, iterations, 'geometric', variance_reduction = variance_reduction)
+
+def finite_diff_price(num_stock_steps, PDE_method, rannacher_steps, grid_type):
+    """European put by finite differences, starting from an empty cache so the timing includes the factorization."""
+
+    fd_cache_clear()
+    return FDPricer(STOCK_PRICE, STRIKE_PRICE, FD_TIME_STEPS, PERIOD, VOLATILITY, INTEREST_RATE).calculate_option_price(
+        OPTION_TYPE, FD_MAX_STOCK_PRICE, num_stock_steps, PDE_method, rannacher_steps, grid_type = grid_type)
+
+def finite_diff_cases(quick):
+    """European put over a sweep of stock grid sizes, uniform and strike-concentrated."""
+
+    reference = black_scholes(OPTION_TYPE, STOCK_PRICE, STRIKE_PRICE, PERIOD, VOLATILITY, INTEREST_RATE)
+    for num_stock_steps in (25, 50, 100, 200) if quick else (25, 50, 100, 200, 400, 800):
+        for PDE_method, rannacher_steps in (('implicit', 0), ('crank-nicolson', 2)):
+            for grid_type in ('uniform', 'sinh'):
+                yield f'{PDE_method}-{grid_type}', 'grid', num_stock_steps, reference, \
+                    lambda args = (num_stock_steps, PDE_method, rannacher_steps, grid_type): finite_diff_price(*args)
+
+CASES = {'black_scholes': black_scholes_cases,
+         'BinomialTree': binomial_tree_cases,
+         'BinomialTree_Asian': binomial_tree_asian_cases,
+         'MonteCarlo': monte_carlo_cases,
+         'MonteCarlo_Asian': monte_carlo_asian_cases,
+         'FiniteDiff': finite_diff_cases}
+
+def run(engines, warmups, repeats, quick):
+    """Run the benchmark sweeps of the selected engines and return one result row per case."""
+
+    rows = []
+    for engine in engines:
+        start_time = perf_counter()
+        for method, parameter, size, reference, func in CASES[engine](quick):
+            price, best_time, median_time = time_call(func, warmups, repeats)
+            rows.append({'engine': engine, 'method': method, 'option_type': OPTION_TYPE, 'parameter': parameter,
+                         'size': size, 'price': price, 'reference': reference, 'abs_error': abs(price - reference),
+                         'best_time': best_time, 'median_time': median_time, 'repeats': repeats})
+        print(f'{engine}: {sum(row["engine"] == engine for row in rows)} cases in {perf_counter() - start_time:.1f} s')
+    return rows
+
+def compare(rows, baseline_file, threshold):
+    """
+    Compare median times with a previous benchmark run.
+
+    Parameters:
+    rows (list): Result rows of this run.
+    baseline_file (str): CSV written by an earlier run.
+    threshold (float): Slowdown factor above which a case is reported as a regression.
+
+    Returns:
+    list: Descriptions of the regressed cases.
+    """
+    with open(baseline_file, newline='') as csvfile:
+        baseline = {(row['engine'], row['method'], row['size']): float(row['median_time']) for row in csv.DictReader(csvfile)}
+
+    regressions = []
+    for row in rows:
+        previous = baseline.get((row['engine'], row['method'], str(row['size'])))
+        if previous and row['median_time'] > threshold * previous:
+            regressions.append(f'{row["engine"]} {row["method"]} {row["parameter"]}={row["size"]}: '
+                               f'{previous:.3g} s -> {row["median_time"]:.3g} s')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pricing engines: error against the analytic reference versus time.')
+    parser.add_argument('-e', '--engines', nargs = '+', choices = ENGINES, default = list(ENGINES), help = 'engines to benchmark (default: all)')
+    parser.add_argument('-w', '--warmups', type = int, default = 1, help = 'untimed calls before each case (default: 1)')
+    parser.add_argument('-n', '--repeats', type = int, default = 5, help = 'timed calls per case (default: 5)')
+    parser.add_argument('-q', '--quick', action = 'store_true', help = 'shorter sweeps')
+    parser.add_argument('-o', '--output', default = OUTPUT_FILE, help = 'CSV file for the results')
+    parser.add_argument('-b', '--baseline', help = 'CSV of an earlier run; exit with status 1 on a slowdown')
+    parser.add_argument('-t', '--threshold', type = float, default = 1.5, help = 'slowdown factor reported as a regression (default: 1.5)')
+    args = parser.parse_args()
+
+    rows = run(args.engines, args.warmups, args.repeats, args.quick)
+
+    with open(args.output, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    if args.baseline:
+        regressions = compare(rows, args.baseline, args.threshold)
+        for regression in regressions:
+            print('Regression:', regression)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Constants and configurations
+MODULES = ('BlackScholes', 'BinomialTree', 'BinomialTree_Asian', 'MonteCarlo', 'MonteCarlo_Asian', 'FiniteDiff',
+           'Greeks', 'ImpliedVolatility', 'Portfolio')
+FORBIDDEN = ('scipy',)  # Packages that must only be loaded on first use, never at import time
+BUDGET = 0.25           # Seconds allowed per module import, numpy included
+REPEATS = 5
+
+PROBE = """
+import sys
+from time import perf_counter
+start_time = perf_counter()
+import {module}
+elapsed = perf_counter() - start_time
+print(json.dumps({{'time': elapsed, 'loaded': sorted({{name.split('.')[0] for name in sys.modules}})}}))
+"""
+
+def import_time(module, repeats):
+    """
+    Time the import of a module in fresh interpreters.
+
+    Parameters:
+    module (str): Module name.
+    repeats (int): Number of interpreters to start; the best time is kept.
+
+    Returns:
+    tuple: (best import time in seconds, top-level packages loaded by the import).
+    """
+    best_time, loaded = float('inf'), []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', 'import json' + PROBE.format(module = module)], cwd = ROOT,
+                                check = True, capture_output = True, text = True).stdout
+        result = json.loads(output)
+        best_time, loaded = min(best_time, result['time']), result['loaded']
+    return best_time, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that the pricer modules import within a start-up budget.')
+    parser.add_argument('-b', '--budget', type = float, default = BUDGET, help = f'seconds per module import (default: {BUDGET})')
+    parser.add_argument('-n', '--repeats', type = int, default = REPEATS, help = f'fresh interpreters per module (default: {REPEATS})')
+    args = parser.parse_args()
+
+    failures = []
+    for module in MODULES:
+        elapsed, loaded = import_time(module, args.repeats)
+        eager = [name for name in FORBIDDEN if name in loaded]
+        print(f'{module:20s} {elapsed * 1e3:8.1f} ms' + (f'  imports {", ".join(eager)}' if eager else ''))
+        if elapsed > args.budget:
+            failures.append(f'{module} took {elapsed * 1e3:.1f} ms (budget {args.budget * 1e3:.0f} ms)')
+        if eager:
+            failures.append(f'{module} imports {", ".join(eager)} eagerly')
+
+    for failure in failures:
+        print('Failure:', failure)
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+
+    main()
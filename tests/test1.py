@@ -4,7 +4,7 @@ import csv
 sys.path.append('/Users/lliang/Deloitte/options/')
 
 from BlackScholes import *
-from BinomialTree import OptionPricer as BTPricer
+from BinomialTree import BatchOptionPricer as BTBatchPricer
 from MonteCarlo import OptionPricer as MCPricer
 from FiniteDiff import OptionPricer as FDPricer
 
@@ -34,9 +34,9 @@ if __name__=='__main__':
     stock_prices = [i for i in range(1,100)]
     Nt = 10
 
-    option_analytic = [black_scholes('EP', stock_price, strike_price, period, volatility, interest_rate) for stock_price in stock_prices]
-    option_BT = [BTPricer(stock_price, strike_price, Nt, period, volatility, interest_rate).calculate_option_price(option_type) for stock_price in stock_prices]
+    option_analytic = black_scholes_batch('EP', stock_prices, strike_price, period, volatility, interest_rate)
+    option_BT = BTBatchPricer(stock_prices, strike_price, Nt, period, volatility, interest_rate).calculate_option_price(option_type)
     option_MC = [MCPricer(stock_price, strike_price, Nt, period, volatility, interest_rate).calculate_option_price(option_type, 10000) for stock_price in stock_prices]
-    option_FD = [FDPricer(stock_price, strike_price, Nt, period, volatility, interest_rate).calculate_option_price(option_type, 200, 100, 'implicit') for stock_price in stock_prices]
+    option_FD = FDPricer(stock_prices[0], strike_price, Nt, period, volatility, interest_rate).calculate_price_surface(option_type, 200, 100, 'implicit').price(stock_prices)
 
     write_output(option_type, stock_prices, option_analytic, option_BT, option_MC, option_FD)
@@ -35,7 +35,7 @@ if __name__=='__main__':
     stock_prices = [i for i in range(1,100)]
     Nt = 10
 
-    option_analytic = [black_scholes(f'A{option_type}-A', stock_price, strike_price, period, volatility, interest_rate) for stock_price in stock_prices]
+    option_analytic = black_scholes_batch(f'A{option_type}-A', stock_prices, strike_price, period, volatility, interest_rate)
     option_BT = [BTPricer(stock_price, strike_price, Nt, period, volatility, interest_rate).calculate_asian_option_price(option_type, AVE_METHOD) for stock_price in stock_prices]
     option_MC = [MCPricer(stock_price, strike_price, Nt, period, volatility, interest_rate).calculate_asian_option_price(option_type, 10000, AVE_METHOD) for stock_price in stock_prices]
 